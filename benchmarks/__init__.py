@@ -0,0 +1,145 @@
+"""
+Benchmark suite for pyswf
+
+Each benchmark measures a fixed workload built by the seeded synthetic
+SWF generator (swf.generator), so results of different releases (or
+branches) can be compared directly. Run it with
+
+    python -m benchmarks [--filter NAME] [--output FILE] [--baseline FILE]
+
+Results are written as JSON: one record per benchmark with the best,
+median and mean time of the repeats and the throughput in work items
+(bits, edges, pixels, ...) per second.
+"""
+from __future__ import absolute_import
+import gc
+import platform
+import time
+
+try:
+    timer = time.perf_counter
+except AttributeError:
+    timer = time.time
+
+BENCHMARKS = []
+
+class Benchmark(object):
+    """
+    A registered benchmark.
+
+    @param name : stable identifier, used to match baseline results
+    @param setup : callable returning the function to time. It is
+                   called before every repeat and is not timed itself.
+    @param items : amount of work done by one call of the timed function
+    @param unit : name of the work items
+    """
+    def __init__(self, name, setup, items=1, unit="calls", description=None):
+        self.name = name
+        self.setup = setup
+        self.items = items
+        self.unit = unit
+        self.description = description or (setup.__doc__ or "").strip()
+
+    def run(self, repeats=5):
+        times = []
+        for i in range(repeats):
+            func = self.setup()
+            gc_enabled = gc.isenabled()
+            gc.collect()
+            gc.disable()
+            try:
+                start = timer()
+                func()
+                times.append(timer() - start)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+        return BenchmarkResult(self, times)
+
+class BenchmarkResult(object):
+    def __init__(self, benchmark, times):
+        self.benchmark = benchmark
+        self.times = times
+
+    @property
+    def best(self):
+        return min(self.times)
+
+    @property
+    def median(self):
+        times = sorted(self.times)
+        n = len(times)
+        if n % 2:
+            return times[n // 2]
+        return (times[n // 2 - 1] + times[n // 2]) / 2.0
+
+    @property
+    def mean(self):
+        return sum(self.times) / len(self.times)
+
+    def as_dict(self):
+        return {
+            "name": self.benchmark.name,
+            "description": self.benchmark.description,
+            "repeats": len(self.times),
+            "items": self.benchmark.items,
+            "unit": self.benchmark.unit,
+            "best": self.best,
+            "median": self.median,
+            "mean": self.mean,
+            "throughput": self.benchmark.items / self.best if self.best > 0 else None,
+        }
+
+    def __str__(self):
+        return "%-32s best: %10.6fs  median: %10.6fs  %12.0f %s/s" % (
+            self.benchmark.name, self.best, self.median,
+            self.benchmark.items / self.best if self.best > 0 else 0,
+            self.benchmark.unit)
+
+def benchmark(name, items=1, unit="calls"):
+    """ Decorator registering a setup function as a Benchmark """
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, setup, items, unit))
+        return setup
+    return register
+
+def load():
+    """ Import the benchmark modules, which register their benchmarks """
+    from . import bench_stream, bench_shape, bench_bitmap, bench_export, bench_movie
+    return BENCHMARKS
+
+def run(names=None, repeats=5, callback=None):
+    """
+    Run the benchmarks whose name starts with any of @names (all if None).
+    Returns a dict with the environment and a list of results.
+    """
+    results = []
+    for bench in load():
+        if names and not any(bench.name.startswith(n) for n in names):
+            continue
+        result = bench.run(repeats)
+        if callback is not None:
+            callback(result)
+        results.append(result.as_dict())
+    return {
+        "python": platform.python_implementation() + " " + platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+def compare(results, baseline):
+    """
+    Compare two run() results by benchmark name.
+    Returns a list of (name, baseline best, best, ratio), where ratio > 1
+    means slower than the baseline.
+    """
+    base = dict((r["name"], r) for r in baseline["results"])
+    rows = []
+    for r in results["results"]:
+        b = base.get(r["name"])
+        if b is None:
+            continue
+        rows.append((r["name"], b["best"], r["best"],
+            r["best"] / b["best"] if b["best"] > 0 else None))
+    return rows
@@ -0,0 +1,38 @@
+from __future__ import absolute_import
+import argparse
+import json
+import sys
+from . import run, compare
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                 description="Run the pyswf benchmark suite")
+parser.add_argument("--filter", action="append", metavar="NAME",
+                    help="Only run benchmarks whose name starts with NAME (repeatable)")
+parser.add_argument("--repeats", type=int, default=5,
+                    help="Number of timed runs per benchmark (default: 5)")
+parser.add_argument("--output", metavar="FILE",
+                    help="Write the JSON results to FILE instead of stdout")
+parser.add_argument("--baseline", type=argparse.FileType('r'), metavar="FILE",
+                    help="Compare against the JSON results of an earlier run")
+
+def main(options):
+    def progress(result):
+        sys.stderr.write("%s\n" % result)
+
+    results = run(options.filter, options.repeats, progress)
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+    if options.baseline:
+        sys.stderr.write("\n%-32s %12s %12s %8s\n" % ("benchmark", "baseline", "current", "ratio"))
+        for name, base, best, ratio in compare(results, json.load(options.baseline)):
+            sys.stderr.write("%-32s %11.6fs %11.6fs %7.2fx\n" % (name, base, best, ratio or 0))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(parser.parse_args()))
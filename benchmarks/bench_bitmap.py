@@ -0,0 +1,72 @@
+"""
+Bitmap decoding
+"""
+from __future__ import absolute_import
+from io import BytesIO
+import random
+import struct
+import zlib
+from swf import bitmap
+from swf.consts import BitmapFormat
+from swf.generator import define_bits_lossless
+from swf.stream import SWFBufferStream
+from swf.tag import TagDefineBitsJPEG3, TagDefineBitsLossless2
+from . import benchmark
+
+SIZE = 512
+
+def _tag(format=BitmapFormat.BIT_24):
+    body = define_bits_lossless(1, random.Random(0), SIZE, SIZE, format)
+    tag = TagDefineBitsLossless2()
+    tag.parse(SWFBufferStream(body), len(body), 10)
+    return tag
+
+@benchmark("bitmap.define_bits_lossless.decode", items=SIZE * SIZE, unit="pixels")
+def bits_lossless():
+    """ TagDefineBitsLossless2 decoding (get_rgba) of a 512x512 32-bit bitmap """
+    tag = _tag()
+    bitmap.cache.clear()
+    return tag.get_rgba
+
+@benchmark("bitmap.define_bits_lossless.decode.bit8", items=SIZE * SIZE, unit="pixels")
+def bits_lossless_bit8():
+    """ TagDefineBitsLossless2 decoding (get_rgba) of a 512x512 colormapped bitmap """
+    tag = _tag(BitmapFormat.BIT_8)
+    bitmap.cache.clear()
+    return tag.get_rgba
+
+@benchmark("bitmap.define_bits_lossless.png", items=SIZE * SIZE, unit="pixels")
+def bits_lossless_png():
+    """ TagDefineBitsLossless2 PNG encoding (get_png) of a decoded 512x512 32-bit bitmap """
+    tag = _tag()
+    bitmap.cache.clear()
+    tag.get_rgba()
+    return tag.get_png
+
+def _jpeg3_tag():
+    from PIL import Image
+    rnd = random.Random(0)
+    rgba = define_bits_lossless(1, rnd, SIZE, SIZE)
+    image = Image.frombytes("RGBA", (SIZE, SIZE), zlib.decompress(rgba[7:]))
+    jpeg = BytesIO()
+    image.convert("RGB").save(jpeg, "JPEG")
+    jpeg = jpeg.getvalue()
+    body = struct.pack("<HI", 1, len(jpeg)) + jpeg + zlib.compress(image.split()[3].tobytes())
+    tag = TagDefineBitsJPEG3()
+    tag.parse(SWFBufferStream(body), len(body), 10)
+    return tag
+
+@benchmark("bitmap.define_bits_jpeg3", items=SIZE * SIZE, unit="pixels")
+def bits_jpeg3():
+    """ TagDefineBitsJPEG3 decoding with alpha (get_image) of a 512x512 bitmap """
+    tag = _jpeg3_tag()
+    return tag.get_image
+
+@benchmark("bitmap.decode_bitmaps", items=16 * SIZE * SIZE, unit="pixels")
+def decode_bitmaps():
+    """ decode_bitmaps() of 16 512x512 32-bit bitmaps on the default thread pool """
+    from swf.generator import generate
+    from swf.movie import SWF
+    swf = SWF(BytesIO(generate(shapes=0, bitmaps=16, bitmap_size=SIZE)))
+    bitmap.cache.clear()
+    return lambda: bitmap.decode_bitmaps(swf.tags)
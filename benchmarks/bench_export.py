@@ -0,0 +1,22 @@
+"""
+SVG export
+"""
+from __future__ import absolute_import
+from io import BytesIO
+from swf.generator import generate
+from swf.movie import SWF
+from . import benchmark
+
+SHAPES = 50
+EDGES = 200
+
+@benchmark("export.svg", items=SHAPES, unit="shapes")
+def svg():
+    """ SVGExporter.export of 50 shapes of 200 edges and 2 bitmaps """
+    from swf import bitmap
+    from swf.export import SVGExporter
+    swf = SWF(BytesIO(generate(shapes=SHAPES, edges=EDGES, bitmaps=2)))
+    bitmap.cache.clear()
+    def func():
+        SVGExporter().export(swf)
+    return func
@@ -0,0 +1,33 @@
+"""
+End-to-end parsing
+"""
+from __future__ import absolute_import
+from io import BytesIO
+from swf.generator import generate
+from swf.movie import SWF
+from . import benchmark
+
+MOVIE = dict(shapes=100, edges=200, bitmaps=4, bitmap_size=128, sprites=10, frames=100)
+FWS = generate("FWS", **MOVIE)
+CWS = generate("CWS", **MOVIE)
+ZWS = generate("ZWS", **MOVIE)
+
+def _parse(data):
+    def func():
+        SWF(BytesIO(data))
+    return func
+
+@benchmark("movie.parse.fws", items=len(FWS), unit="bytes")
+def parse_fws():
+    """ SWF() of an uncompressed movie with 100 shapes, 4 bitmaps and 100 frames """
+    return _parse(FWS)
+
+@benchmark("movie.parse.cws", items=len(FWS), unit="bytes")
+def parse_cws():
+    """ SWF() of the same movie, zlib compressed """
+    return _parse(CWS)
+
+@benchmark("movie.parse.zws", items=len(FWS), unit="bytes")
+def parse_zws():
+    """ SWF() of the same movie, LZMA compressed """
+    return _parse(ZWS)
@@ -0,0 +1,65 @@
+"""
+Shape record decoding and edge map building
+"""
+from __future__ import absolute_import
+import random
+from swf.data import SWFShape
+from swf.generator import SWFWriter
+from swf.stream import SWFBufferStream
+from . import benchmark
+
+EDGES = 10000
+CLEAN_EDGES = 2000
+
+def _shape_records(edges):
+    w = SWFWriter()
+    w.writeSHAPERECORDS(random.Random(0), edges)
+    return w.getvalue()
+
+def _stream(data, compact=False):
+    stream = SWFBufferStream(data)
+    stream.compact_shapes = compact
+    return stream
+
+def _parse(edges, compact=False):
+    shape = SWFShape()
+    shape.parse(_stream(_shape_records(edges), compact))
+    return shape
+
+@benchmark("shape.read_shape_records", items=EDGES, unit="edges")
+def read_shape_records():
+    """ SWFShape.read_shape_records of a 10k edge shape """
+    data = _shape_records(EDGES)
+    def func():
+        SWFShape().parse(SWFBufferStream(data))
+    return func
+
+@benchmark("shape.read_shape_records.compact", items=EDGES, unit="edges")
+def read_shape_records_compact():
+    """ SWFShape.read_shape_records of a 10k edge shape into a SWFShapeRecordTable """
+    data = _shape_records(EDGES)
+    def func():
+        SWFShape().parse(_stream(data, True))
+    return func
+
+@benchmark("shape.create_edge_maps", items=EDGES, unit="edges")
+def create_edge_maps():
+    """ SWFShape._create_edge_maps of a 10k edge shape """
+    return _parse(EDGES)._create_edge_maps
+
+@benchmark("shape.create_edge_maps.compact", items=EDGES, unit="edges")
+def create_edge_maps_compact():
+    """ SWFShape._create_edge_maps of a 10k edge SWFShapeRecordTable """
+    return _parse(EDGES, True)._create_edge_maps
+
+@benchmark("shape.clean_edge_map", items=CLEAN_EDGES, unit="edges")
+def clean_edge_map():
+    """ SWFShape._clean_edge_map of 2k shuffled edges """
+    shape = _parse(CLEAN_EDGES)
+    shape._create_edge_maps()
+    edges = [edge for edge_map in shape.fill_edge_maps for path in edge_map.values() for edge in path]
+    random.Random(0).shuffle(edges)
+    edge_map = {1: edges}
+    def func():
+        shape._clean_edge_map(edge_map)
+    return func
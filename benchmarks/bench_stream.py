@@ -0,0 +1,45 @@
+"""
+Bit reader throughput
+"""
+from __future__ import absolute_import
+import random
+from io import BytesIO
+from swf.stream import SWFStream, SWFBufferStream
+from . import benchmark
+
+READS = 200000
+BITS = 13
+
+def _data():
+    rnd = random.Random(0)
+    return bytes(bytearray(rnd.getrandbits(8) for _ in range(READS * BITS // 8 + 1)))
+
+def _read_bits(read):
+    def func():
+        for i in range(READS):
+            read(BITS)
+    return func
+
+@benchmark("stream.readbits", items=READS, unit="reads")
+def readbits():
+    """ SWFStream.readbits(13) on a file stream """
+    s = SWFStream(BytesIO(_data()))
+    return _read_bits(s.readbits)
+
+@benchmark("stream.readSB", items=READS, unit="reads")
+def readSB():
+    """ SWFStream.readSB(13) on a file stream """
+    s = SWFStream(BytesIO(_data()))
+    return _read_bits(s.readSB)
+
+@benchmark("stream.buffer.readbits", items=READS, unit="reads")
+def buffer_readbits():
+    """ SWFBufferStream.readbits(13) """
+    s = SWFBufferStream(_data())
+    return _read_bits(s.readbits)
+
+@benchmark("stream.buffer.readSB", items=READS, unit="reads")
+def buffer_readSB():
+    """ SWFBufferStream.readSB(13) """
+    s = SWFBufferStream(_data())
+    return _read_bits(s.readSB)
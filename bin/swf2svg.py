@@ -1,13 +1,19 @@
 from __future__ import absolute_import
 import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
 from swf.movie import SWF
 from swf.export import SVGExporter, SingleShapeSVGExporterMixin, FrameSVGExporterMixin, NamesSVGExporterMixin
 
-parser = argparse.ArgumentParser(description="Convert an SWF file into an SVG")
+parser = argparse.ArgumentParser(description="Convert an SWF file into an SVG, or a batch of SWF files into SVGs")
 parser.add_argument("--swf", type=argparse.FileType('rb'),
-                    help="Location of SWG file to convert", required=True)
+                    help="Location of SWG file to convert", required=False)
 parser.add_argument("--svg", type=argparse.FileType('wb'),
-                    help="Location of converted SVG file", required=True)
+                    help="Location of converted SVG file", required=False)
 parser.add_argument("--shape", type=int,
                     help="Only export shape SHAPE (integer)", required=False)
 parser.add_argument("--frame", type=int,
@@ -15,38 +21,214 @@ parser.add_argument("--frame", type=int,
 parser.add_argument("--names", action='store_true',
                     help='For each element, extract SWF instanceName to class="n-<name>"', required=False)
 
-options = parser.parse_args()
-argparse.swf_file = options.swf
+batch = parser.add_argument_group("batch mode")
+batch.add_argument("inputs", nargs="*", metavar="INPUT",
+                   help="SWF files, directories (searched recursively) or glob patterns to convert")
+batch.add_argument("--manifest", type=argparse.FileType('r'),
+                   help="File listing one SWF per line, optionally followed by a tab and the SVG path")
+batch.add_argument("--out-dir",
+                   help="Directory for the SVG files (default: next to each SWF)")
+batch.add_argument("--jobs", type=int, default=None,
+                   help="Number of worker processes (default: number of CPUs)")
+batch.add_argument("--timeout", type=float, default=None,
+                   help="Give up on a file after TIMEOUT seconds (needs SIGALRM, i.e. not on Windows)")
+batch.add_argument("--force", action='store_true',
+                   help="Convert files whose SVG is already newer than the SWF as well")
+batch.add_argument("--summary",
+                   help="Write a JSON summary of per-file timings and failures to SUMMARY")
 
-# load and parse the SWF
-swf = SWF(options.swf)
 
-export_opts = {}
-export_mixins = []
+class ConversionTimeout(Exception):
+    """ Raised in a worker when a conversion takes longer than --timeout """
 
 
-# process the optional arguments
+def make_exporter(shape=None, frame=None, names=False):
+    """ Create an SVGExporter with the mixins for the chosen options """
+    export_opts = {}
+    export_mixins = []
 
-if options.shape is not None:
-    export_mixins.append(SingleShapeSVGExporterMixin)
-    export_opts['shape'] = options.shape
+    if shape is not None:
+        export_mixins.append(SingleShapeSVGExporterMixin)
+        export_opts['shape'] = shape
 
-if options.frame is not None:
-    export_mixins.append(FrameSVGExporterMixin)
-    export_opts['frame'] = options.frame
+    if frame is not None:
+        export_mixins.append(FrameSVGExporterMixin)
+        export_opts['frame'] = frame
 
-if options.names:
-    export_mixins.append(NamesSVGExporterMixin)
+    if names:
+        export_mixins.append(NamesSVGExporterMixin)
 
+    # create the SVG exporter
+    svg_exporter = SVGExporter()
 
-# create the SVG exporter
-svg_exporter = SVGExporter()
+    # NB: Construct the class dynamically, since the chosen options dictate which mixins to use.
+    svg_exporter.__class__ = type('ThisExporter', tuple(export_mixins + [SVGExporter]), {})
+    return svg_exporter, export_opts
 
-# NB: Construct the class dynamically, since the chosen options dictate which mixins to use.
-svg_exporter.__class__ = type('ThisExporter', tuple(export_mixins + [SVGExporter]), {})
 
-# export!
-svg = svg_exporter.export(swf, **export_opts)
+def convert(swf_file, svg_file, shape=None, frame=None, names=False):
+    """ Convert the SWF file object swf_file and write the SVG to svg_file """
+    # load and parse the SWF
+    swf = SWF(swf_file)
 
-# save the SVG
-options.svg.write(svg.read())
+    # export!
+    svg_exporter, export_opts = make_exporter(shape, frame, names)
+    svg = svg_exporter.export(swf, **export_opts)
+
+    # save the SVG
+    svg_file.write(svg.read())
+
+
+def _on_timeout(signum, frame):
+    raise ConversionTimeout()
+
+
+def convert_path(swf_path, svg_path, export_options, timeout=None):
+    """
+    Batch worker: convert swf_path into svg_path.
+    Returns the conversion time in seconds.
+    """
+    start = time.time()
+    alarm = timeout and hasattr(signal, 'SIGALRM')
+    if alarm:
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        out_dir = os.path.dirname(svg_path)
+        if out_dir and not os.path.isdir(out_dir):
+            try:
+                os.makedirs(out_dir)
+            except OSError:
+                # created by another worker in the meantime
+                if not os.path.isdir(out_dir):
+                    raise
+        # write next to the target first, so a failed or timed out
+        # conversion never leaves a truncated SVG that looks up to date
+        temp_path = "%s.%d.tmp" % (svg_path, os.getpid())
+        try:
+            with open(swf_path, 'rb') as swf_file:
+                with open(temp_path, 'wb') as svg_file:
+                    convert(swf_file, svg_file, **export_options)
+            if hasattr(os, 'replace'):
+                os.replace(temp_path, svg_path)
+            else:
+                # Python 2: no atomic replace, os.rename doesn't overwrite on Windows
+                if os.path.exists(svg_path):
+                    os.remove(svg_path)
+                os.rename(temp_path, svg_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return time.time() - start
+
+
+def _svg_path(swf_path, root, out_dir):
+    """ Return the SVG path for a SWF found under root """
+    name = os.path.splitext(swf_path)[0] + ".svg"
+    if out_dir is None:
+        return name
+    return os.path.join(out_dir, os.path.relpath(name, root))
+
+
+def collect_jobs(inputs, manifest=None, out_dir=None):
+    """ Return a list of (swf_path, svg_path) for the batch inputs """
+    jobs = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, dirnames, filenames in os.walk(item):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(".swf"):
+                        path = os.path.join(dirpath, filename)
+                        jobs.append((path, _svg_path(path, item, out_dir)))
+        else:
+            paths = sorted(glob.glob(item)) if glob.has_magic(item) else [item]
+            for path in paths:
+                jobs.append((path, _svg_path(path, os.path.dirname(path), out_dir)))
+    if manifest is not None:
+        for line in manifest:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split("\t")
+            path = fields[0]
+            svg_path = fields[1] if len(fields) > 1 else \
+                _svg_path(path, os.path.dirname(path), out_dir)
+            jobs.append((path, svg_path))
+    return jobs
+
+
+def is_up_to_date(swf_path, svg_path):
+    """ Whether svg_path exists and is newer than swf_path """
+    try:
+        return os.path.getmtime(svg_path) >= os.path.getmtime(swf_path)
+    except OSError:
+        return False
+
+
+def run_batch(jobs, export_options, workers=None, timeout=None, force=False):
+    """
+    Convert all jobs in a process pool.
+    Returns a list of per-file result dicts.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    results = []
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for swf_path, svg_path in jobs:
+            result = {"swf": swf_path, "svg": svg_path}
+            results.append(result)
+            if not force and is_up_to_date(swf_path, svg_path):
+                result["status"] = "skipped"
+                continue
+            future = executor.submit(convert_path, swf_path, svg_path, export_options, timeout)
+            pending[future] = result
+        for future, result in pending.items():
+            try:
+                result["seconds"] = round(future.result(), 4)
+                result["status"] = "ok"
+            except ConversionTimeout:
+                result["status"] = "timeout"
+                result["error"] = "timed out after %gs" % timeout
+            except Exception as e:
+                result["status"] = "failed"
+                result["error"] = "%s: %s" % (type(e).__name__, e)
+    return results
+
+
+def main(options):
+    export_options = dict(shape=options.shape, frame=options.frame, names=options.names)
+
+    if options.inputs or options.manifest:
+        start = time.time()
+        jobs = collect_jobs(options.inputs, options.manifest, options.out_dir)
+        results = run_batch(jobs, export_options, options.jobs, options.timeout, options.force)
+        counts = {}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        summary = {
+            "files": results,
+            "total": len(results),
+            "counts": counts,
+            "seconds": round(time.time() - start, 4),
+        }
+        if options.summary:
+            with open(options.summary, 'w') as f:
+                json.dump(summary, f, indent=2)
+        sys.stderr.write("%d files: %s\n" % (len(results),
+            ", ".join("%d %s" % (n, status) for status, n in sorted(counts.items()))))
+        return 1 if counts.get("failed") or counts.get("timeout") else 0
+
+    if options.swf is None or options.svg is None:
+        parser.error("either --swf and --svg, or batch INPUTs / --manifest are required")
+    argparse.swf_file = options.swf
+    convert(options.swf, options.svg, **export_options)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(parser.parse_args()))
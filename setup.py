@@ -20,8 +20,9 @@ setup(
     author_email='tim@floorplanner.com',
     url='https://github.com/timknip/pyswf',
 
-    install_requires = ["lxml>=3.3.0", "Pillow>=2.3.0", "pylzma>=0.4.6", "six"],
-    packages=find_packages(),
+    install_requires = ["lxml>=3.3.0", "Pillow>=2.3.0", "six",
+        "backports.lzma; python_version < '3.3'"],
+    packages=find_packages(exclude=["benchmarks", "test"]),
     license = "MIT",
     classifiers=[
         "Development Status :: 4 - Beta",
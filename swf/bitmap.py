@@ -0,0 +1,159 @@
+"""
+Cache of decoded bitmaps
+
+Bitmap tags only keep their compressed payload when they are parsed and
+decode it the first time the pixels are asked for (see
+TagDefineBitsLossless.get_image(), get_rgba() and get_png()). The decoded
+pixels and encoded PNGs go into an LRU cache bounded by the number of
+bytes it holds, so exporting the same bitmap again, from the same or
+another parse of the file, doesn't decode it again.
+
+The cache is shared by all tags:
+
+    import swf.bitmap
+    swf.bitmap.cache.max_bytes = 256 << 20
+
+decode_bitmaps() decodes the bitmaps of a tag list on a pool of threads
+up front. zlib and the PIL codecs release the GIL while they work, so
+image heavy files are decoded on more than one core:
+
+    decoded = swf.bitmap.decode_bitmaps(swf.tags, threads=8)
+    ...  # get_image() of the decoded tags returns the decoded image
+    swf.bitmap.release_bitmaps(decoded)
+"""
+from __future__ import absolute_import
+from collections import OrderedDict
+import threading
+
+class BitmapCache(object):
+    """
+    Size bounded LRU cache of bytes values.
+
+    When adding a value makes the cache hold more than @max_bytes, the
+    least recently used values are dropped. Values larger than
+    max_bytes are not cached at all. Safe to use from several threads.
+    """
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ Return the value of key (which becomes the most recently used), or None """
+        with self._lock:
+            value = self._values.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self._values[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """ Add a value """
+        with self._lock:
+            old = self._values.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            if len(value) > self.max_bytes:
+                return
+            self._values[key] = value
+            self.nbytes += len(value)
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= len(self._values.popitem(last=False)[1])
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+cache = BitmapCache()
+
+def bitmap_tags(tags):
+    """
+    Yield (tag, jpeg_tables) for the DefineBits* and DefineBitsLossless*
+    tags in @tags and their sprites. For DefineBits tags jpeg_tables is
+    the data of the JPEGTables tag before it, otherwise None.
+    """
+    from .tag import SWFTimelineContainer, TagDefineBits, TagDefineBitsLossless, TagJPEGTables
+    stack = [iter(tags)]
+    jpeg_tables = None
+    while stack:
+        for tag in stack[-1]:
+            if isinstance(tag, SWFTimelineContainer):
+                stack.append(iter(tag.tags))
+                break
+            elif isinstance(tag, TagJPEGTables):
+                if tag.length > 0:
+                    jpeg_tables = bytes(tag.jpegTablesView)
+            elif isinstance(tag, TagDefineBits):
+                yield tag, jpeg_tables if tag.type == TagDefineBits.TYPE else None
+            elif isinstance(tag, TagDefineBitsLossless):
+                yield tag, None
+        else:
+            stack.pop()
+
+def decode_bitmaps(tags, threads=None, select=None, png=False):
+    """
+    Decode the bitmaps of @tags (see bitmap_tags()) concurrently.
+
+    @param threads : size of the thread pool (None: the number of CPUs)
+    @param select : callable returning if a tag should be decoded (all
+                    bitmap tags if None)
+    @param png : encode the decoded bitmaps as PNG as well and keep the
+                 PNGs instead of the images
+
+    The results are kept by their tags, get_image() (get_png()) returns
+    them until release_bitmaps() is called. Bitmaps that fail to decode
+    are left alone (get_image() raises the error when it's called).
+    Returns the list of tags that were decoded.
+    """
+    from multiprocessing.pool import ThreadPool
+    jobs = [(tag, jpeg_tables, png) for tag, jpeg_tables in bitmap_tags(tags)
+            if (tag._png if png else tag._image) is None and (select is None or select(tag))]
+    if len(jobs) == 0:
+        return []
+    pool = ThreadPool(threads)
+    try:
+        results = pool.map(_decode_bitmap, jobs, 1)
+    finally:
+        pool.close()
+        pool.join()
+    decoded = []
+    for (tag, jpeg_tables, png), result in zip(jobs, results):
+        if result is None:
+            continue
+        if png:
+            tag._png = result
+        else:
+            tag._image = result
+        decoded.append(tag)
+    return decoded
+
+def release_bitmaps(tags):
+    """ Drop the results decode_bitmaps() kept for @tags """
+    for tag in tags:
+        tag._image = None
+        tag._png = None
+
+def _decode_bitmap(job):
+    tag, jpeg_tables, png = job
+    args = () if jpeg_tables is None else (jpeg_tables,)
+    try:
+        if png:
+            return tag.get_png(*args)
+        image = tag.get_image(*args)
+        # Image.open() only reads the header
+        image.load()
+        return image
+    except Exception:
+        return None
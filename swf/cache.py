@@ -0,0 +1,183 @@
+"""
+On-disk cache of SWF tag indexes
+
+The tag table of contents of a SWF (see swf.tag.SWFTagIndex) is stored
+in a small binary file, either next to the SWF (<name>.swfidx) or in a
+cache directory. An entry belongs to the content it was built from: it
+records the SHA-1 of the SWF file, validated cheaply against the file
+size and modification time, and only re-hashed when the mtime changed.
+
+In a cache directory the entries are keyed by content: they are named
+after the SHA-1 of the SWF (<sha1>.swfidx), so identical files at
+different paths share one entry and a moved file still finds it. The
+size, mtime and SHA-1 last seen for each path are kept in small stat
+records (paths/<sha1 of the path>), so unchanged files aren't hashed.
+"""
+from __future__ import absolute_import
+from .tag import SWFTagIndex
+import binascii
+import hashlib
+import os
+import struct
+
+MAGIC = b"SWFIDX"
+VERSION = 1
+
+# magic, version, file size, file mtime, file sha1, tag stream length,
+# number of tags, number of frames
+_HEADER = struct.Struct("<6sBQd20sIII")
+# file size, file mtime, file sha1
+_STAT = struct.Struct("<Qd20s")
+
+try:
+    _replace = os.replace
+except AttributeError:
+    # Python 2: no atomic replace, and os.rename doesn't overwrite on Windows
+    def _replace(src, dst):
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+def cache_path(filename, cache=True, digest=None):
+    """
+    Return the path of the cache entry for filename.
+    @param cache : True for a sidecar file, or a cache directory
+    @param digest : SHA-1 of the file contents, which names the entries
+                    in a cache directory (computed if None)
+    """
+    if cache is True:
+        return filename + ".swfidx"
+    if digest is None:
+        digest = file_digest(filename)
+    return os.path.join(cache, binascii.hexlify(digest).decode("ascii") + ".swfidx")
+
+def _stat_path(filename, cache):
+    """ Return the path of the stat record of filename in a cache directory """
+    key = hashlib.sha1(os.path.abspath(filename).encode("utf-8")).hexdigest()
+    return os.path.join(cache, "paths", key)
+
+def file_digest(filename):
+    """ Return the SHA-1 digest of the contents of filename """
+    h = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+def dump_tag_index(index, size, mtime, digest):
+    """ Serialize a SWFTagIndex and the file info it is valid for """
+    n = len(index)
+    return b"".join([
+        _HEADER.pack(MAGIC, VERSION, size, mtime, digest,
+            index.file_length, n, len(index.frames)),
+        struct.pack("<%dH" % n, *index.types),
+        struct.pack("<%dI" % n, *index.offsets),
+        struct.pack("<%dI" % n, *index.lengths),
+        struct.pack("<%di" % n, *index.characterIds),
+        struct.pack("<%dI" % len(index.frames), *index.frames)])
+
+def parse_tag_index(data):
+    """
+    Deserialize a cache entry.
+    Returns (size, mtime, digest, index), raises ValueError if invalid.
+    """
+    try:
+        magic, version, size, mtime, digest, file_length, n, frames = \
+            _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a tag index cache entry")
+        index = SWFTagIndex()
+        index.file_length = file_length
+        pos = _HEADER.size
+        for column, code, width in (
+                (index.types, "H", 2), (index.offsets, "I", 4),
+                (index.lengths, "I", 4), (index.characterIds, "i", 4)):
+            column.extend(struct.unpack_from("<%d%s" % (n, code), data, pos))
+            pos += n * width
+        index.frames.extend(struct.unpack_from("<%dI" % frames, data, pos))
+    except struct.error:
+        raise ValueError("truncated tag index cache entry")
+    return size, mtime, digest, index
+
+def _write(path, data):
+    d = os.path.dirname(path)
+    if d and not os.path.isdir(d):
+        os.makedirs(d)
+    temp = "%s.%d.tmp" % (path, os.getpid())
+    with open(temp, "wb") as f:
+        f.write(data)
+    _replace(temp, path)
+
+def load_tag_index(filename, cache=True):
+    """
+    Return the cached SWFTagIndex of filename, or None if there is
+    no valid entry for the current contents of the file.
+    """
+    if cache is not True:
+        return _load_from_directory(filename, cache)
+    path = cache_path(filename, cache)
+    try:
+        with open(path, "rb") as f:
+            size, mtime, digest, index = parse_tag_index(f.read())
+        st = os.stat(filename)
+    except (IOError, OSError, ValueError):
+        return None
+    if st.st_size != size:
+        return None
+    if st.st_mtime != mtime:
+        if file_digest(filename) != digest:
+            return None
+        # touched but unchanged, refresh the entry
+        try:
+            _write(path, dump_tag_index(index, size, st.st_mtime, digest))
+        except (IOError, OSError):
+            pass
+    return index
+
+def _load_from_directory(filename, cache):
+    try:
+        st = os.stat(filename)
+    except (IOError, OSError):
+        return None
+    # the stat record tells the digest of an unchanged file
+    digest = None
+    try:
+        with open(_stat_path(filename, cache), "rb") as f:
+            size, mtime, known = _STAT.unpack(f.read(_STAT.size))
+        if size == st.st_size and mtime == st.st_mtime:
+            digest = known
+    except (IOError, OSError, struct.error):
+        pass
+    hashed = digest is None
+    try:
+        if hashed:
+            digest = file_digest(filename)
+        with open(cache_path(filename, cache, digest), "rb") as f:
+            size, mtime, entry_digest, index = parse_tag_index(f.read())
+    except (IOError, OSError, ValueError):
+        return None
+    if entry_digest != digest or size != st.st_size:
+        return None
+    if hashed:
+        # new, moved or touched file
+        try:
+            _write(_stat_path(filename, cache), _STAT.pack(st.st_size, st.st_mtime, digest))
+        except (IOError, OSError):
+            pass
+    return index
+
+def save_tag_index(filename, index, cache=True):
+    """
+    Store the SWFTagIndex of filename in the cache.
+    Returns False if the entry couldn't be written.
+    """
+    try:
+        st = os.stat(filename)
+        digest = file_digest(filename)
+        _write(cache_path(filename, cache, digest),
+               dump_tag_index(index, st.st_size, st.st_mtime, digest))
+        if cache is not True:
+            _write(_stat_path(filename, cache), _STAT.pack(st.st_size, st.st_mtime, digest))
+    except (IOError, OSError):
+        return False
+    return True
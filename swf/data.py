@@ -3,10 +3,23 @@ from .consts import *
 from .utils import *
 from six.moves import map
 from six.moves import range
+from array import array
 
 class _dumb_repr(object):
+    __slots__ = ()
+
     def __repr__(self):
-        return '<%s %r>' % (self.__class__.__name__, self.__dict__)
+        return '<%s %r>' % (self.__class__.__name__, self._attributes())
+
+    def _attributes(self):
+        """ Return the instance attributes (__slots__ and __dict__) as a dict """
+        attributes = {}
+        for cls in reversed(type(self).__mro__):
+            for name in cls.__dict__.get('__slots__', ()):
+                if hasattr(self, name):
+                    attributes[name] = getattr(self, name)
+        attributes.update(getattr(self, '__dict__', {}))
+        return attributes
 
 class SWFRawTag(_dumb_repr):
     def __init__(self, s=None):
@@ -17,11 +30,13 @@ class SWFRawTag(_dumb_repr):
         pos = s.tell()
         self.header = s.readtag_header()
         self.pos_content = s.tell()
-        s.f.seek(pos)
+        s.seek(pos)
         #self.bytes = s.f.read(self.header.tag_length())
         #s.f.seek(self.pos_content)
 
 class SWFStraightEdge(_dumb_repr):
+    __slots__ = ('start', 'to', 'line_style_idx', 'fill_style_idx')
+
     def __init__(self, start, to, line_style_idx, fill_style_idx):
         self.start = start
         self.to = to
@@ -32,6 +47,8 @@ class SWFStraightEdge(_dumb_repr):
         return SWFStraightEdge(self.to, self.start, self.line_style_idx, new_fill_idx)
 
 class SWFCurvedEdge(SWFStraightEdge):
+    __slots__ = ('control',)
+
     def __init__(self, start, control, to, line_style_idx, fill_style_idx):
         super(SWFCurvedEdge, self).__init__(start, to, line_style_idx, fill_style_idx)
         self.control = control
@@ -52,7 +69,6 @@ class SWFShape(_dumb_repr):
         self.current_fill_edge_map = {}
         self.current_line_edge_map = {}
         self.num_groups = 0
-        self.coord_map = {}
         if not data is None:
             self.parse(data, level)
 
@@ -75,6 +91,8 @@ class SWFShape(_dumb_repr):
         if handler is None:
             from .export import SVGShapeExporter
             handler = SVGShapeExporter()
+        if getattr(handler, 'twips', False):
+            handler.unit_divisor = self.unit_divisor
         handler.begin_shape()
         for i in range(0, self.num_groups):
             self._export_fill_path(handler, i)
@@ -87,34 +105,15 @@ class SWFShape(_dumb_repr):
         return self._records
 
     def read_shape_records(self, data, fill_bits, line_bits, level=1):
-        shape_record = None
-        record_id = 0
-        while type(shape_record) != SWFShapeRecordEnd:
-            # The SWF10 spec says that shape records are byte aligned.
-            # In reality they seem not to be?
-            # bitsPending = 0;
-            edge_record = (data.readUB(1) == 1)
-            if edge_record:
-                straight_flag = (data.readUB(1) == 1)
-                num_bits = data.readUB(4) + 2
-                if straight_flag:
-                    shape_record = data.readSTRAIGHTEDGERECORD(num_bits)
-                else:
-                    shape_record = data.readCURVEDEDGERECORD(num_bits)
-            else:
-                states= data.readUB(5)
-                if states == 0:
-                    shape_record = SWFShapeRecordEnd()
-                else:
-                    style_change_record = data.readSTYLECHANGERECORD(states, fill_bits, line_bits, level)
-                    if style_change_record.state_new_styles:
-                        fill_bits = style_change_record.num_fillbits
-                        line_bits = style_change_record.num_linebits
-                    shape_record = style_change_record
-            shape_record.record_id = record_id
-            self._records.append(shape_record)
-            record_id += 1
-            #print shape_record.tostring()
+        # The SWF10 spec says that shape records are byte aligned.
+        # In reality they seem not to be?
+        if data.shape_handler is not None:
+            # streamed to the handler, nothing is kept
+            data.readSHAPERECORDS(fill_bits, line_bits, level, data.shape_handler)
+            return
+        table = data.readSHAPERECORDS(fill_bits, line_bits, level)
+        # without compact_shapes, the records are SWFShapeRecord objects
+        self._records = table if data.compact_shapes else list(table)
 
     def _create_edge_maps(self):
         if self._edgeMapsCreated:
@@ -134,12 +133,36 @@ class SWFShape(_dumb_repr):
         self.current_line_edge_map = {}
         self.num_groups = 0
 
-        for i in range(0, len(self._records)):
-            rec = self._records[i]
-            if rec.type == SWFShapeRecord.TYPE_STYLECHANGE:
+        records = self._records
+        compact = isinstance(records, SWFShapeRecordTable)
+        if compact:
+            types, xs, ys, x2s, y2s = records.types, records.x, records.y, records.x2, records.y2
+        for i in range(0, len(records)):
+            if compact:
+                # edges straight from the columns
+                rec_type = types[i]
+                if rec_type == SWFShapeRecord.TYPE_STRAIGHTEDGE:
+                    start = [xPos, yPos]
+                    xPos += xs[i]
+                    yPos += ys[i]
+                    sub_path.append(SWFStraightEdge(start, [xPos, yPos], curr_ls_idx, curr_fs_idx1))
+                    continue
+                if rec_type == SWFShapeRecord.TYPE_CURVEDEDGE:
+                    start = [xPos, yPos]
+                    xPosControl = xPos + xs[i]
+                    yPosControl = yPos + ys[i]
+                    xPos = xPosControl + x2s[i]
+                    yPos = yPosControl + y2s[i]
+                    sub_path.append(SWFCurvedEdge(start, [xPosControl, yPosControl], [xPos, yPos], curr_ls_idx, curr_fs_idx1))
+                    continue
+                rec = records.style_change(i) if rec_type == SWFShapeRecord.TYPE_STYLECHANGE else None
+            else:
+                rec = records[i]
+                rec_type = rec.type
+            if rec_type == SWFShapeRecord.TYPE_STYLECHANGE:
                 if rec.state_line_style or rec.state_fill_style0 or rec.state_fill_style1:
                     if len(sub_path):
-                        self._process_sub_path(sub_path, curr_ls_idx, curr_fs_idx0, curr_fs_idx1, rec.record_id)
+                        self._process_sub_path(sub_path, curr_ls_idx, curr_fs_idx0, curr_fs_idx1, i)
                     sub_path = []
 
                 if rec.state_new_styles:
@@ -178,8 +201,8 @@ class SWFShape(_dumb_repr):
                 if rec.state_moveto:
                     xPos = rec.move_deltaX
                     yPos = rec.move_deltaY
-            elif rec.type == SWFShapeRecord.TYPE_STRAIGHTEDGE:
-                start = [NumberUtils.round_pixels_400(xPos), NumberUtils.round_pixels_400(yPos)]
+            elif rec_type == SWFShapeRecord.TYPE_STRAIGHTEDGE:
+                start = [xPos, yPos]
                 if rec.general_line_flag:
                     xPos += rec.deltaX
                     yPos += rec.deltaY
@@ -188,21 +211,21 @@ class SWFShape(_dumb_repr):
                         yPos += rec.deltaY
                     else:
                         xPos += rec.deltaX
-                to = [NumberUtils.round_pixels_400(xPos), NumberUtils.round_pixels_400(yPos)]
+                to = [xPos, yPos]
                 sub_path.append(SWFStraightEdge(start, to, curr_ls_idx, curr_fs_idx1))
-            elif rec.type == SWFShapeRecord.TYPE_CURVEDEDGE:
-                start = [NumberUtils.round_pixels_400(xPos), NumberUtils.round_pixels_400(yPos)]
+            elif rec_type == SWFShapeRecord.TYPE_CURVEDEDGE:
+                start = [xPos, yPos]
                 xPosControl = xPos + rec.control_deltaX
                 yPosControl = yPos + rec.control_deltaY
                 xPos = xPosControl + rec.anchor_deltaX
                 yPos = yPosControl + rec.anchor_deltaY
                 control = [xPosControl, yPosControl]
-                to = [NumberUtils.round_pixels_400(xPos), NumberUtils.round_pixels_400(yPos)]
+                to = [xPos, yPos]
                 sub_path.append(SWFCurvedEdge(start, control, to, curr_ls_idx, curr_fs_idx1))
-            elif rec.type == SWFShapeRecord.TYPE_END:
+            elif rec_type == SWFShapeRecord.TYPE_END:
                 # We're done. Process the last subpath, if any
                 if len(sub_path) > 0:
-                    self._process_sub_path(sub_path, curr_ls_idx, curr_fs_idx0, curr_fs_idx1, rec.record_id)
+                    self._process_sub_path(sub_path, curr_ls_idx, curr_fs_idx0, curr_fs_idx1, i)
                     self._clean_edge_map(self.current_fill_edge_map)
                     self._clean_edge_map(self.current_line_edge_map)
                     self.fill_edge_maps.append(self.current_fill_edge_map)
@@ -242,62 +265,68 @@ class SWFShape(_dumb_repr):
 
     def _clean_edge_map(self, edge_map):
         for style_idx in edge_map:
-            sub_path = edge_map[style_idx] if style_idx in edge_map else None
-            if sub_path is not None and len(sub_path) > 0:
-                tmp_path = []
-                prev_edge = None
-                self._create_coord_map(sub_path)
-                while len(sub_path) > 0:
-                    idx = 0
-                    while idx < len(sub_path):
-                        if prev_edge is None or self._equal_point(prev_edge.to, sub_path[idx].start):
-                            edge = sub_path[idx]
-                            del sub_path[idx]
-                            tmp_path.append(edge)
-                            self._remove_edge_from_coord_map(edge)
-                            prev_edge = edge
-                        else:
-                            edge = self._find_next_edge_in_coord_map(prev_edge)
-                            if not edge is None:
-                                idx = sub_path.index(edge)
-                            else:
-                                idx = 0
-                                prev_edge = None
-                edge_map[style_idx] = tmp_path
-
-    def _equal_point(self, a, b, tol=0.001):
-        return (a[0] > b[0]-tol and a[0] < b[0]+tol and a[1] > b[1]-tol and a[1] < b[1]+tol)
-
-    def _find_next_edge_in_coord_map(self, edge):
-        key = "%0.4f_%0.4f" % (edge.to[0], edge.to[1])
-        if key in self.coord_map and len(self.coord_map[key]) > 0:
-            return self.coord_map[key][0]
-        else:
-            return None
+            sub_path = edge_map[style_idx]
+            if len(sub_path) > 0:
+                edge_map[style_idx] = self._chain_edges(sub_path)
 
-    def _create_coord_map(self, path):
-        self.coord_map = {}
-        for i in range(0, len(path)):
-            start = path[i].start
-            key = "%0.4f_%0.4f" % (start[0], start[1])
-            coord_map_array = self.coord_map[key] if key in self.coord_map else None
-            if coord_map_array is None:
-                self.coord_map[key] = [path[i]]
+    def _chain_edges(self, path):
+        """
+        Reorder the edges of path so that connected edges follow each other.
+        Starting at the first edge, the edge following the last one taken is
+        used if it connects, otherwise the first remaining edge starting
+        where the last one ends. If there is none, a new chain is started at
+        the first remaining edge. Linear in the number of edges.
+        """
+        count = len(path)
+        # doubly linked list of the remaining edges, in path order
+        next_idx = list(range(1, count + 1))
+        next_idx[-1] = -1
+        prev_idx = list(range(-1, count - 1))
+        head = 0
+        # edges by start point (twips), consumed through a moving offset
+        starts = {}
+        for i in range(count):
+            key = (path[i].start[0], path[i].start[1])
+            if key in starts:
+                starts[key].append(i)
             else:
-                self.coord_map[key].append(path[i])
-
-    def _remove_edge_from_coord_map(self, edge):
-        key = "%0.4f_%0.4f" % (edge.start[0], edge.start[1])
-        if key in self.coord_map:
-            coord_map_array = self.coord_map[key]
-            if len(coord_map_array) == 1:
-                del self.coord_map[key]
+                starts[key] = [i]
+        offsets = dict.fromkeys(starts, 0)
+        taken = [False] * count
+
+        chained = []
+        prev_to = None
+        idx = 0
+        while len(chained) < count:
+            if idx == -1:
+                idx = head
+            edge = path[idx]
+            if prev_to is None or prev_to == (edge.start[0], edge.start[1]):
+                chained.append(edge)
+                taken[idx] = True
+                prev_to = (edge.to[0], edge.to[1])
+                # unlink
+                n, p = next_idx[idx], prev_idx[idx]
+                if p == -1:
+                    head = n
+                else:
+                    next_idx[p] = n
+                if n != -1:
+                    prev_idx[n] = p
+                idx = n
             else:
-                try:
-                    idx = coord_map_array.index(edge)
-                    del coord_map_array[idx]
-                except:
-                    pass
+                candidates = starts.get(prev_to)
+                idx = -1
+                if candidates is not None:
+                    offset = offsets[prev_to]
+                    while offset < len(candidates) and taken[candidates[offset]]:
+                        offset += 1
+                    offsets[prev_to] = offset
+                    if offset < len(candidates):
+                        idx = candidates[offset]
+                if idx == -1:
+                    prev_to = None
+        return chained
 
     def _create_path_from_edge_map(self, edge_map):
         new_path = []
@@ -313,7 +342,7 @@ class SWFShape(_dumb_repr):
         path = self._create_path_from_edge_map(self.fill_edge_maps[group_index])
 
         pos = [100000000, 100000000]
-        u = 1.0 / self.unit_divisor
+        u = 1 if getattr(handler, 'twips', False) else 1.0 / self.unit_divisor
         fill_style_idx = 10000000
 
         if len(path) < 1:
@@ -363,7 +392,7 @@ class SWFShape(_dumb_repr):
                     # which represents the font color. We just report solid black in this case.
                     handler.begin_fill(0)
 
-            if not self._equal_point(pos, e.start):
+            if pos[0] != e.start[0] or pos[1] != e.start[1]:
                 handler.move_to(e.start[0] * u, e.start[1] * u)
 
             if type(e) is SWFCurvedEdge:
@@ -380,7 +409,7 @@ class SWFShape(_dumb_repr):
 
         path = self._create_path_from_edge_map(self.line_edge_maps[group_index])
         pos = [100000000, 100000000]
-        u = 1.0 / self.unit_divisor
+        u = 1 if getattr(handler, 'twips', False) else 1.0 / self.unit_divisor
         line_style_idx = 10000000
         line_style = None
         if len(path) < 1:
@@ -462,7 +491,7 @@ class SWFShape(_dumb_repr):
                 else:
                     # we should never get here
                     handler.line_style(0)
-            if not self._equal_point(pos, e.start):
+            if pos[0] != e.start[0] or pos[1] != e.start[1]:
                 handler.move_to(e.start[0] * u, e.start[1] * u)
             if type(e) is SWFCurvedEdge:
                 handler.curve_to(e.control[0] * u, e.control[1] * u, e.to[0] * u, e.to[1] * u)
@@ -540,9 +569,10 @@ class SWFShapeRecord(_dumb_repr):
     TYPE_STRAIGHTEDGE = 3
     TYPE_CURVEDEDGE = 4
 
-    record_id = -1
+    __slots__ = ('record_id',)
 
     def __init__(self, data=None, level=1):
+        self.record_id = -1
         if not data is None:
             self.parse(data, level)
 
@@ -562,6 +592,8 @@ class SWFShapeRecord(_dumb_repr):
         return "    [SWFShapeRecord]"
 
 class SWFShapeRecordStraightEdge(SWFShapeRecord):
+    __slots__ = ('num_bits', 'general_line_flag', 'vert_line_flag', 'deltaX', 'deltaY')
+
     def __init__(self, data, num_bits=0, level=1):
         self.num_bits = num_bits
         super(SWFShapeRecordStraightEdge, self).__init__(data, level)
@@ -592,6 +624,8 @@ class SWFShapeRecordStraightEdge(SWFShapeRecord):
         return s
 
 class SWFShapeRecordCurvedEdge(SWFShapeRecord):
+    __slots__ = ('num_bits', 'control_deltaX', 'control_deltaY', 'anchor_deltaX', 'anchor_deltaY')
+
     def __init__(self, data, num_bits=0, level=1):
         self.num_bits = num_bits
         super(SWFShapeRecordCurvedEdge, self).__init__(data, level)
@@ -612,6 +646,11 @@ class SWFShapeRecordCurvedEdge(SWFShapeRecord):
             " AnchorDelta: %d, %d" % (self.anchor_deltaX, self.anchor_deltaY)
 
 class SWFShapeRecordStyleChange(SWFShapeRecord):
+    __slots__ = ('fill_styles', 'line_styles', 'state_new_styles', 'state_line_style',
+                 'state_fill_style1', 'state_fill_style0', 'state_moveto',
+                 'num_fillbits', 'num_linebits', 'move_deltaX', 'move_deltaY',
+                 'fill_style0', 'fill_style1', 'line_style')
+
     def __init__(self, data, states=0, fill_bits=0, line_bits=0, level=1):
         self.fill_styles = []
         self.line_styles = []
@@ -671,6 +710,8 @@ class SWFShapeRecordStyleChange(SWFShapeRecord):
             " flags: %d %d %d" % (self.state_fill_style0, self.state_fill_style1, self.state_line_style)
 
 class SWFShapeRecordEnd(SWFShapeRecord):
+    __slots__ = ()
+
     def __init__(self):
         super(SWFShapeRecordEnd, self).__init__(None)
 
@@ -684,7 +725,230 @@ class SWFShapeRecordEnd(SWFShapeRecord):
     def __str__(self):
         return "    [SWFShapeRecordEnd]"
 
+class SWFShapeRecordHandler(object):
+    """
+    Callback interface for shape record parsing.
+
+    Set as the shape_handler of the SWF (or of the stream) to have the
+    records of every shape, glyph and morph shape passed to it as plain
+    ints, straight from the bitstream, instead of being stored in the
+    shape's records. Every shape ends with on_end(). Subclass and
+    override the callbacks you need.
+    """
+    def on_style_change(self, states, move_dx, move_dy, fill_style0, fill_style1, line_style,
+                        fill_bits, line_bits, fill_styles, line_styles):
+        """
+        A style change record.
+
+        @param states : the 5 state flags (new styles, line style,
+                        fill style 1, fill style 0, moveto)
+        @param move_dx, move_dy : the moveto position in twips (0 if
+                        the record has no moveto)
+        @param fill_style0, fill_style1, line_style : style indices (0 if
+                        not set by the record)
+        @param fill_bits, line_bits : bit counts in effect after the record
+        @param fill_styles, line_styles : the new style arrays, or None
+        """
+        pass
+
+    def on_line(self, num_bits, flags, dx, dy):
+        """
+        A straight edge record of dx, dy twips. @flags has
+        SWFShapeRecordTable.FLAG_GENERAL_LINE set for general lines and
+        FLAG_VERT_LINE for vertical ones (horizontal lines have neither).
+        """
+        pass
+
+    def on_curve(self, num_bits, control_dx, control_dy, anchor_dx, anchor_dy):
+        """ A curved edge record, deltas in twips """
+        pass
+
+    def on_end(self):
+        """ The end record of a shape """
+        pass
+
+class SWFShapeRecordTable(SWFShapeRecordHandler):
+    """
+    Columnar storage of shape records.
+
+    Records are kept in parallel arrays instead of one object per record:
+    types / num_bits / flags (unsigned bytes) and x, y, x2, y2 (ints).
+    Straight edges store their deltas in x, y and the general line (1)
+    and vertical line (2) flags in flags. Curved edges store the control
+    delta in x, y and the anchor delta in x2, y2. Style change records
+    store their move delta in x, y and the index into the style change
+    side table in x2. The side table has columns for the state flags,
+    the fill and line style indices and the fill and line bits in effect
+    after the record, the new fill and line style arrays are kept in
+    new_styles (by side table index).
+
+    Indexing or iterating creates the SWFShapeRecord objects on the fly,
+    so the table can be used like the list of records of a shape.
+    """
+    FLAG_GENERAL_LINE = 1
+    FLAG_VERT_LINE = 2
+
+    def __init__(self):
+        self.types = array('B')
+        self.num_bits = array('B')
+        self.flags = array('B')
+        self.x = array('i')
+        self.y = array('i')
+        self.x2 = array('i')
+        self.y2 = array('i')
+        # style change side table
+        self.style_states = array('B')
+        self.style_fill0 = array('H')
+        self.style_fill1 = array('H')
+        self.style_line = array('H')
+        self.style_fill_bits = array('B')
+        self.style_line_bits = array('B')
+        self.new_styles = {}
+
+    def append_line(self, num_bits, flags, dx, dy):
+        self.types.append(SWFShapeRecord.TYPE_STRAIGHTEDGE)
+        self.num_bits.append(num_bits)
+        self.flags.append(flags)
+        self.x.append(dx)
+        self.y.append(dy)
+        self.x2.append(0)
+        self.y2.append(0)
+
+    def append_curve(self, num_bits, control_dx, control_dy, anchor_dx, anchor_dy):
+        self.types.append(SWFShapeRecord.TYPE_CURVEDEDGE)
+        self.num_bits.append(num_bits)
+        self.flags.append(0)
+        self.x.append(control_dx)
+        self.y.append(control_dy)
+        self.x2.append(anchor_dx)
+        self.y2.append(anchor_dy)
+
+    def append_style_change(self, states, move_dx, move_dy, fill_style0, fill_style1, line_style,
+                            fill_bits, line_bits, fill_styles=None, line_styles=None):
+        """
+        Append a style change record. fill_bits and line_bits are the
+        bit counts in effect after the record.
+        """
+        index = len(self.style_states)
+        self.types.append(SWFShapeRecord.TYPE_STYLECHANGE)
+        self.num_bits.append(0)
+        self.flags.append(0)
+        self.x.append(move_dx)
+        self.y.append(move_dy)
+        self.x2.append(index)
+        self.y2.append(0)
+        self.style_states.append(states)
+        self.style_fill0.append(fill_style0)
+        self.style_fill1.append(fill_style1)
+        self.style_line.append(line_style)
+        self.style_fill_bits.append(fill_bits)
+        self.style_line_bits.append(line_bits)
+        if states & 0x10:
+            self.new_styles[index] = (fill_styles, line_styles)
+
+    def append_style_change_record(self, record):
+        """ Append a SWFShapeRecordStyleChange """
+        states = (record.state_new_styles << 4) | (record.state_line_style << 3) | \
+            (record.state_fill_style1 << 2) | (record.state_fill_style0 << 1) | record.state_moveto
+        self.append_style_change(states,
+            record.move_deltaX if record.state_moveto else 0,
+            record.move_deltaY if record.state_moveto else 0,
+            record.fill_style0, record.fill_style1, record.line_style,
+            record.num_fillbits, record.num_linebits,
+            record.fill_styles, record.line_styles)
+
+    def append_end(self):
+        self.types.append(SWFShapeRecord.TYPE_END)
+        self.num_bits.append(0)
+        self.flags.append(0)
+        self.x.append(0)
+        self.y.append(0)
+        self.x2.append(0)
+        self.y2.append(0)
+
+    # SWFShapeRecordHandler, readSHAPERECORDS fills the table
+    on_style_change = append_style_change
+    on_line = append_line
+    on_curve = append_curve
+    on_end = append_end
+
+    @property
+    def nbytes(self):
+        """ Size of the columns in bytes (without the new style arrays) """
+        return sum(len(c) * c.itemsize for c in (self.types, self.num_bits,
+            self.flags, self.x, self.y, self.x2, self.y2,
+            self.style_states, self.style_fill0, self.style_fill1, self.style_line,
+            self.style_fill_bits, self.style_line_bits))
+
+    def as_numpy(self):
+        """
+        Return the columns as a dict of NumPy arrays sharing the memory
+        of the table (requires numpy)
+        """
+        import numpy
+        columns = {}
+        for name in ("types", "num_bits", "flags", "x", "y", "x2", "y2",
+                     "style_states", "style_fill0", "style_fill1", "style_line",
+                     "style_fill_bits", "style_line_bits"):
+            column = getattr(self, name)
+            columns[name] = numpy.frombuffer(column, dtype=numpy.dtype(column.typecode))
+        return columns
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.types)
+        record_type = self.types[index]
+        if record_type == SWFShapeRecord.TYPE_STYLECHANGE:
+            return self.style_change(index)
+        if record_type == SWFShapeRecord.TYPE_STRAIGHTEDGE:
+            record = SWFShapeRecordStraightEdge(None, self.num_bits[index])
+            flags = self.flags[index]
+            record.general_line_flag = (flags & self.FLAG_GENERAL_LINE) != 0
+            record.vert_line_flag = (flags & self.FLAG_VERT_LINE) != 0
+            record.deltaX = self.x[index] \
+                if record.general_line_flag or not record.vert_line_flag else 0.0
+            record.deltaY = self.y[index] \
+                if record.general_line_flag or record.vert_line_flag else 0.0
+        elif record_type == SWFShapeRecord.TYPE_CURVEDEDGE:
+            record = SWFShapeRecordCurvedEdge(None, self.num_bits[index])
+            record.control_deltaX = self.x[index]
+            record.control_deltaY = self.y[index]
+            record.anchor_deltaX = self.x2[index]
+            record.anchor_deltaY = self.y2[index]
+        else:
+            record = SWFShapeRecordEnd()
+        record.record_id = index
+        return record
+
+    def style_change(self, index):
+        """ Return the style change record at index as a SWFShapeRecordStyleChange """
+        k = self.x2[index]
+        states = self.style_states[k]
+        record = SWFShapeRecordStyleChange(None, states,
+            self.style_fill_bits[k], self.style_line_bits[k])
+        if record.state_moveto:
+            record.move_deltaX = self.x[index]
+            record.move_deltaY = self.y[index]
+        record.fill_style0 = self.style_fill0[k]
+        record.fill_style1 = self.style_fill1[k]
+        record.line_style = self.style_line[k]
+        if record.state_new_styles:
+            fill_styles, line_styles = self.new_styles[k]
+            record.fill_styles.extend(fill_styles)
+            record.line_styles.extend(line_styles)
+        record.record_id = index
+        return record
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self[i]
+
 class SWFMatrix(_dumb_repr):
+    __slots__ = ('scaleX', 'scaleY', 'rotateSkew0', 'rotateSkew1', 'translateX', 'translateY')
+
     def __init__(self, data):
         self.scaleX = 1.0
         self.scaleY = 1.0
@@ -727,6 +991,8 @@ class SWFMatrix(_dumb_repr):
         return "[%s]" % ",".join(map(fmt, self.to_array()))
 
 class SWFGradientRecord(_dumb_repr):
+    __slots__ = ('_records', 'ratio', 'color')
+
     def __init__(self, data=None, level=1):
         self._records = []
         if not data is None:
@@ -975,6 +1241,8 @@ class SWFMorphLineStyle2(SWFMorphLineStyle):
             self.endColor = data.readRGBA()
 
 class SWFRecordHeader(_dumb_repr):
+    __slots__ = ('type', 'content_length', 'header_length')
+
     def __init__(self, type, content_length, header_length):
         self.type = type
         self.content_length = content_length
@@ -985,6 +1253,8 @@ class SWFRecordHeader(_dumb_repr):
         return self.header_length + self.content_length
 
 class SWFRectangle(_dumb_repr):
+    __slots__ = ('xmin', 'xmax', 'ymin', 'ymax')
+
     def __init__(self):
         self.xmin = self.xmax = self.ymin = self.ymax = 0
 
@@ -1117,6 +1387,8 @@ class SWFSymbol(_dumb_repr):
         return "ID %d, Name: %s" % (self.tagId, self.name)
 
 class SWFGlyphEntry(_dumb_repr):
+    __slots__ = ('index', 'advance')
+
     def __init__(self, data=None, glyphBits=0, advanceBits=0):
         if not data is None:
             self.parse(data, glyphBits, advanceBits)
@@ -1130,6 +1402,8 @@ class SWFGlyphEntry(_dumb_repr):
         return "Index: %d, Advance: %d" % (self.index, self.advance)
 
 class SWFKerningRecord(_dumb_repr):
+    __slots__ = ('code1', 'code2', 'adjustment')
+
     def __init__(self, data=None, wideCodes=False):
         if not data is None:
             self.parse(data, wideCodes)
@@ -8,6 +8,7 @@ from .utils import *
 from .data import *
 from .tag import *
 from .filters import *
+from . import bitmap as _bitmap
 from lxml import objectify
 from lxml import etree
 import base64
@@ -52,8 +53,14 @@ class DefaultShapeExporter(object):
     The default (abstract) Shape exporter class.
     All shape exporters should extend this class.
 
-
+    Exporters that set twips to True get the coordinates passed to
+    move_to, line_to and curve_to as integer twips (or font units),
+    and unit_divisor set to the divisor that converts them to pixels.
+    Otherwise the coordinates are passed in pixels.
     """
+    twips = False
+    unit_divisor = 20.0
+
     def __init__(self, swf=None, debug=False, force_stroke=False):
         self.swf = None
         self.debug = debug
@@ -124,6 +131,10 @@ class DefaultShapeExporter(object):
         pass
 
 class DefaultSVGShapeExporter(DefaultShapeExporter):
+    twips = True
+    _unit_divisor = 20.0
+    _unit_scale = 1.0 / 20.0
+
     def __init__(self, defs=None):
         self.defs = defs
         self.current_draw_command = ""
@@ -132,29 +143,41 @@ class DefaultSVGShapeExporter(DefaultShapeExporter):
                         namespace=SVG_NS, nsmap={None : SVG_NS, "xlink" : XLINK_NS})
         super(DefaultSVGShapeExporter, self).__init__()
 
+    @property
+    def unit_divisor(self):
+        return self._unit_divisor
+
+    @unit_divisor.setter
+    def unit_divisor(self, value):
+        self._unit_divisor = value
+        self._unit_scale = 1.0 / value
+
     def move_to(self, x, y):
+        u = self._unit_scale
         self.current_draw_command = ""
         self.path_data += "M" + \
-            str(NumberUtils.round_pixels_20(x)) + " " + \
-            str(NumberUtils.round_pixels_20(y)) + " "
+            str(NumberUtils.round_pixels_20(x * u)) + " " + \
+            str(NumberUtils.round_pixels_20(y * u)) + " "
 
     def line_to(self, x, y):
+        u = self._unit_scale
         if self.current_draw_command != "L":
             self.current_draw_command = "L"
             self.path_data += "L"
         self.path_data += "" + \
-            str(NumberUtils.round_pixels_20(x)) + " " + \
-            str(NumberUtils.round_pixels_20(y)) + " "
+            str(NumberUtils.round_pixels_20(x * u)) + " " + \
+            str(NumberUtils.round_pixels_20(y * u)) + " "
 
     def curve_to(self, cx, cy, ax, ay):
+        u = self._unit_scale
         if self.current_draw_command != "Q":
             self.current_draw_command = "Q"
             self.path_data += "Q"
         self.path_data += "" + \
-            str(NumberUtils.round_pixels_20(cx)) + " " + \
-            str(NumberUtils.round_pixels_20(cy)) + " " + \
-            str(NumberUtils.round_pixels_20(ax)) + " " + \
-            str(NumberUtils.round_pixels_20(ay)) + " "
+            str(NumberUtils.round_pixels_20(cx * u)) + " " + \
+            str(NumberUtils.round_pixels_20(cy * u)) + " " + \
+            str(NumberUtils.round_pixels_20(ax * u)) + " " + \
+            str(NumberUtils.round_pixels_20(ay * u)) + " "
 
     def begin_bitmap_fill(self, bitmap_id, matrix=None, repeat=False, smooth=False):
         self.finalize_path()
@@ -391,6 +414,15 @@ class SVGShapeExporter(DefaultSVGShapeExporter):
 
 
 class BaseExporter(object):
+    # 0 decodes the bitmaps one by one while exporting (through the size
+    # bounded swf.bitmap.cache), otherwise they are decoded up front on a
+    # pool of this many threads (None: the number of CPUs) and all kept
+    # until the export is done
+    bitmap_threads = 0
+    # decoded bitmaps are passed to export_encoded_image() as PNG data
+    # instead of to export_image(), the pool encodes them as well
+    embed_png = False
+
     def __init__(self, swf=None, shape_exporter=None, force_stroke=False):
         self.shape_exporter = SVGShapeExporter() if shape_exporter is None else shape_exporter
         self.clip_depth = 0
@@ -402,52 +434,48 @@ class BaseExporter(object):
 
     def export(self, swf, force_stroke=False):
         self.force_stroke = force_stroke
-        self.export_define_shapes(swf.tags)
-        self.export_display_list(self.get_display_tags(swf.tags))
+        decoded = []
+        if self.bitmap_threads != 0:
+            decoded = _bitmap.decode_bitmaps(swf.tags, self.bitmap_threads,
+                                             self.decodes_bitmap, self.embed_png)
+        try:
+            self.export_define_shapes(swf.tags)
+            self.export_display_list(self.get_display_tags(swf.tags))
+        finally:
+            _bitmap.release_bitmaps(decoded)
+
+    def decodes_bitmap(self, tag):
+        """ Return if exporting the bitmap tag decodes its pixels """
+        if isinstance(tag, TagDefineBitsJPEG3):
+            return len(tag.bitmapAlphaDataView) > 0
+        return isinstance(tag, TagDefineBitsLossless)
 
     def export_define_bits(self, tag):
-        png_buffer = BytesIO()
-        image = None
-        if isinstance(tag, TagDefineBitsJPEG3):
+        if isinstance(tag, TagDefineBitsJPEG3) and len(tag.bitmapAlphaDataView) > 0:
+            # the alpha plane has to be merged with the pixels
+            self.export_decoded_bitmap(tag)
+            return
 
-            tag.bitmapData.seek(0)
-            tag.bitmapAlphaData.seek(0, 2)
-            num_alpha = tag.bitmapAlphaData.tell()
-            tag.bitmapAlphaData.seek(0)
-            image = Image.open(tag.bitmapData)
-            if num_alpha > 0:
-                image_width = image.size[0]
-                image_height = image.size[1]
-                image_data = image.getdata()
-                image_data_len = len(image_data)
-                if num_alpha == image_data_len:
-                    buff = ""
-                    for i in range(0, num_alpha):
-                        alpha = ord(tag.bitmapAlphaData.read(1))
-                        rgb = list(image_data[i])
-                        buff += struct.pack("BBBB", rgb[0], rgb[1], rgb[2], alpha)
-                    image = Image.frombytes("RGBA", (image_width, image_height), buff)
-        elif isinstance(tag, TagDefineBitsJPEG2):
-            tag.bitmapData.seek(0)
-            image = Image.open(tag.bitmapData)
+        # JPEG (and PNG) data is exported as it is
+        jpeg_tables = None
+        if self.jpegTables is not None:
+            self.jpegTables.seek(0)
+            jpeg_tables = self.jpegTables.read()
+        data = tag.get_image_data(jpeg_tables)
+        bitmap_type = ImageUtils.get_image_type(data)
+        if bitmap_type == BitmapType.JPEG or bitmap_type == BitmapType.PNG:
+            self.export_encoded_image(tag, data, bitmap_type)
         else:
-            tag.bitmapData.seek(0)
-            if self.jpegTables is not None:
-                buff = BytesIO()
-                self.jpegTables.seek(0)
-                buff.write(self.jpegTables.read())
-                buff.write(tag.bitmapData.read())
-                buff.seek(0)
-                image = Image.open(buff)
-            else:
-                image = Image.open(tag.bitmapData)
-
-        self.export_image(tag, image)
+            self.export_image(tag, Image.open(BytesIO(data)))
 
     def export_define_bits_lossless(self, tag):
-        tag.bitmapData.seek(0)
-        image = Image.open(tag.bitmapData)
-        self.export_image(tag, image)
+        self.export_decoded_bitmap(tag)
+
+    def export_decoded_bitmap(self, tag):
+        if self.embed_png:
+            self.export_encoded_image(tag, tag.get_png(), BitmapType.PNG)
+        else:
+            self.export_image(tag, tag.get_image())
 
     def export_define_sprite(self, tag, parent=None):
         display_tags = self.get_display_tags(tag.tags)
@@ -487,6 +515,14 @@ class BaseExporter(object):
     def export_image(self, tag, image=None):
         pass
 
+    def export_encoded_image(self, tag, data, bitmap_type):
+        """
+        Export an image that is exported without decoding it: the bytes
+        of a JPEG or PNG file (@bitmap_type, see BitmapType). By default
+        it is decoded and passed on to export_image().
+        """
+        self.export_image(tag, Image.open(BytesIO(data)))
+
     def get_display_tags(self, tags, z_sorted=True):
         dp_tuples = []
         for tag in tags:
@@ -505,6 +541,8 @@ class BaseExporter(object):
         return None
 
 class SVGExporter(BaseExporter):
+    embed_png = True
+
     def __init__(self, swf=None, margin=0):
         self._e = objectify.ElementMaker(annotate=False,
                         namespace=SVG_NS, nsmap={None : SVG_NS, "xlink" : XLINK_NS})
@@ -546,7 +584,7 @@ class SVGExporter(BaseExporter):
         return self._serialize()
 
     def _serialize(self):
-        return cStringIO(etree.tostring(self.svg,
+        return BytesIO(etree.tostring(self.svg,
                 encoding="UTF-8", xml_declaration=True))
 
     def export_define_sprite(self, tag, parent=None):
@@ -798,15 +836,25 @@ class SVGExporter(BaseExporter):
             buff = BytesIO()
             image.save(buff, "PNG")
             buff.seek(0)
-            data_url = _encode_png(buff.read())
-            img = self._e.image()
-            img.set("id", "c%s" % tag.characterId)
-            img.set("x", "0")
-            img.set("y", "0 ")
-            img.set("width", "%s" % str(image.size[0]))
-            img.set("height", "%s" % str(image.size[1]))
-            img.set(XLINK_HREF, "%s" % data_url)
-            self.defs.append(img)
+            self._export_image_element(tag, image.size, _encode_png(buff.read()))
+
+    def export_encoded_image(self, tag, data, bitmap_type):
+        # Image.open only reads the header
+        size = Image.open(BytesIO(data)).size
+        if bitmap_type == BitmapType.JPEG:
+            self._export_image_element(tag, size, _encode_jpeg(data))
+        else:
+            self._export_image_element(tag, size, _encode_png(data))
+
+    def _export_image_element(self, tag, size, data_url):
+        img = self._e.image()
+        img.set("id", "c%s" % tag.characterId)
+        img.set("x", "0")
+        img.set("y", "0 ")
+        img.set("width", "%s" % str(size[0]))
+        img.set("height", "%s" % str(size[1]))
+        img.set(XLINK_HREF, "%s" % data_url)
+        self.defs.append(img)
 
 class SingleShapeSVGExporter(SVGExporter):
     """
@@ -1100,10 +1148,10 @@ class SVGBounds(object):
         self._matrix = self._calc_combined_matrix()
 
 def _encode_jpeg(data):
-    return "data:image/jpeg;base64," + base64.encodestring(data)[:-1]
+    return "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
 
 def _encode_png(data):
-    return "data:image/png;base64," + base64.encodestring(data)[:-1]
+    return "data:image/png;base64," + base64.b64encode(data).decode("ascii")
 
 def _swf_matrix_to_matrix(swf_matrix=None, need_scale=False, need_translate=True, need_rotation=False, unit_div=20.0):
 
@@ -0,0 +1,532 @@
+"""
+Synthetic SWF generator
+
+Writes valid SWF files of controlled size, for scaling tests and
+benchmarks: large shapes, fonts with many glyphs, big lossless bitmaps,
+long timelines, nested sprites, sound stream blocks and video frames.
+The content is random but deterministic for a given seed.
+
+    from swf.generator import generate
+    data = generate("CWS", shapes=10, edges=10000, frames=100000)
+
+Or from the command line:
+
+    python -m swf.generator out.swf --kind ZWS --bitmaps 1 --bitmap-size 4096
+"""
+from __future__ import absolute_import
+from .consts import BitmapFormat
+from .stream import SWFStream
+from io import BytesIO
+import random
+import struct
+import zlib
+
+# tags that must be written with a long header
+_LONG_TAGS = set([6, 19, 20, 21, 35, 36])
+
+class SWFWriter(SWFStream):
+    """
+    SWF writer stream, the counterpart of SWFStream.
+    Bit values are packed MSB first, byte values are written byte
+    aligned, just like the read* methods expect them.
+    """
+    def __init__(self, file=None):
+        super(SWFWriter, self).__init__(BytesIO() if file is None else file)
+        self._write_bits = 0
+        self._write_bits_count = 0
+
+    def align(self):
+        """ Flush the pending bits, padded with zeros to a full byte """
+        if self._write_bits_count:
+            self.f.write(struct.pack("B", self._write_bits << (8 - self._write_bits_count)))
+            self._write_bits = 0
+            self._write_bits_count = 0
+
+    def write(self, data):
+        """ Write raw bytes """
+        self.align()
+        self.f.write(data)
+
+    def getvalue(self):
+        self.align()
+        return self.f.getvalue()
+
+    def writeUB(self, value, bits):
+        """ Write an unsigned value of bits bits """
+        if bits == 0:
+            return
+        bits_count = self._write_bits_count + bits
+        value = (self._write_bits << bits) | (value & ((1 << bits) - 1))
+        out = bytearray()
+        while bits_count >= 8:
+            bits_count -= 8
+            out.append((value >> bits_count) & 0xff)
+        if out:
+            self.f.write(bytes(out))
+        self._write_bits = value & ((1 << bits_count) - 1)
+        self._write_bits_count = bits_count
+
+    def writeSB(self, value, bits):
+        """ Write a signed value of bits bits """
+        self.writeUB(value, bits)
+
+    def writeUI8(self, value):
+        self.write(struct.pack("<B", value))
+
+    def writeUI16(self, value):
+        self.write(struct.pack("<H", value))
+
+    def writeSI16(self, value):
+        self.write(struct.pack("<h", value))
+
+    def writeUI32(self, value):
+        self.write(struct.pack("<I", value))
+
+    def writeFIXED8(self, value):
+        self.write(struct.pack("<h", int(value * 256)))
+
+    def writeRGB(self, value):
+        self.write(struct.pack(">I", value & 0xffffff)[1:])
+
+    def writeRGBA(self, value):
+        self.write(struct.pack(">I", ((value & 0xffffff) << 8) | ((value >> 24) & 0xff)))
+
+    def writeString(self, value):
+        self.write(value + b"\0")
+
+    def writeRECT(self, xmin, xmax, ymin, ymax):
+        """ Write a RECT (values in twips) """
+        self.align()
+        bits = self.calc_max_bits(True, [xmin, xmax, ymin, ymax])
+        self.writeUB(bits, 5)
+        for value in (xmin, xmax, ymin, ymax):
+            self.writeSB(value, bits)
+        self.align()
+
+    def writeMATRIX(self, tx=0, ty=0, scale=None, rotate=None):
+        """
+        Write a MATRIX.
+        @param scale, rotate : optional (x, y) tuples of floats
+        """
+        self.align()
+        for pair in (scale, rotate):
+            self.writeUB(pair is not None, 1)
+            if pair is not None:
+                values = [int(v * 65536) for v in pair]
+                bits = self.calc_max_bits(True, values)
+                self.writeUB(bits, 5)
+                for value in values:
+                    self.writeSB(value, bits)
+        bits = self.calc_max_bits(True, [tx, ty])
+        self.writeUB(bits, 5)
+        self.writeSB(tx, bits)
+        self.writeSB(ty, bits)
+        self.align()
+
+    def writeSHAPERECORDS(self, rnd, edges, num_fill_styles=1, num_line_styles=1, radius=4000):
+        """
+        Write NumFillBits, NumLineBits and the SHAPERECORDs of random closed
+        paths with a total of edges straight and curved edges, picking
+        random fill and line styles from the ones defined.
+        """
+        fill_bits = self.calc_max_bits(False, [num_fill_styles])
+        line_bits = self.calc_max_bits(False, [num_line_styles])
+        self.writeUB(fill_bits, 4)
+        self.writeUB(line_bits, 4)
+        step = max(radius * 3 // 4, 2)
+        done = 0
+        while done < edges:
+            # StyleChangeRecord, always moving to a new path start
+            fill0 = rnd.randint(0, num_fill_styles) if num_fill_styles else 0
+            fill1 = rnd.randint(0, num_fill_styles) if num_fill_styles else 0
+            line = rnd.randint(0, num_line_styles) if num_line_styles else 0
+            self.writeUB(0, 1)
+            self.writeUB(0, 1) # StateNewStyles
+            self.writeUB(num_line_styles > 0, 1)
+            self.writeUB(num_fill_styles > 0, 1)
+            self.writeUB(num_fill_styles > 0, 1)
+            self.writeUB(1, 1) # StateMoveTo
+            x, y = rnd.randint(-radius, radius), rnd.randint(-radius, radius)
+            bits = self.calc_max_bits(True, [x, y])
+            self.writeUB(bits, 5)
+            self.writeSB(x, bits)
+            self.writeSB(y, bits)
+            if num_fill_styles:
+                self.writeUB(fill0, fill_bits)
+                self.writeUB(fill1, fill_bits)
+            if num_line_styles:
+                self.writeUB(line, line_bits)
+
+            n = min(rnd.randint(3, 12), edges - done)
+            x, y = 0, 0
+            for i in range(n):
+                kind = rnd.random()
+                if i == n - 1:
+                    # close the path
+                    dx, dy = -x, -y
+                    kind = 0.0
+                else:
+                    dx, dy = rnd.randint(-step, step), rnd.randint(-step, step)
+                if kind < 0.4:
+                    # general line
+                    bits = max(self.calc_max_bits(True, [dx, dy]), 2)
+                    self.writeUB(3, 2)
+                    self.writeUB(bits - 2, 4)
+                    self.writeUB(1, 1)
+                    self.writeSB(dx, bits)
+                    self.writeSB(dy, bits)
+                elif kind < 0.55:
+                    # vertical or horizontal line
+                    vertical = kind < 0.475
+                    if vertical:
+                        dx = 0
+                    else:
+                        dy = 0
+                    delta = dy if vertical else dx
+                    bits = max(self.calc_max_bits(True, [delta]), 2)
+                    self.writeUB(3, 2)
+                    self.writeUB(bits - 2, 4)
+                    self.writeUB(0, 1)
+                    self.writeUB(vertical, 1)
+                    self.writeSB(delta, bits)
+                else:
+                    control_x, control_y = rnd.randint(-step, step) // 2, rnd.randint(-step, step) // 2
+                    anchor_x, anchor_y = dx - control_x, dy - control_y
+                    values = [control_x, control_y, anchor_x, anchor_y]
+                    bits = max(self.calc_max_bits(True, values), 2)
+                    self.writeUB(2, 2)
+                    self.writeUB(bits - 2, 4)
+                    for value in values:
+                        self.writeSB(value, bits)
+                x += dx
+                y += dy
+            done += n
+        # EndShapeRecord
+        self.writeUB(0, 6)
+        self.align()
+
+    def writeTAG(self, type, body, long=None):
+        """ Write a tag header followed by the tag body """
+        if long is None:
+            long = type in _LONG_TAGS or len(body) >= 0x3f
+        if long:
+            self.write(struct.pack("<Hi", (type << 6) | 0x3f, len(body)))
+        else:
+            self.write(struct.pack("<H", (type << 6) | len(body)))
+        self.write(body)
+
+def _random_bytes(rnd, length):
+    return bytes(bytearray(rnd.getrandbits(8) for _ in range(length)))
+
+def _rows(rnd, row_bytes, height):
+    """
+    Return height rows of row_bytes pseudo random bytes. The rows are
+    windows into one random buffer, so huge bitmaps are cheap to make.
+    """
+    base = _random_bytes(rnd, row_bytes + height)
+    return b"".join(base[i:i + row_bytes] for i in range(height))
+
+def define_shape(characterId, rnd, edges, num_fill_styles=2, num_line_styles=1):
+    """ Return the body of a DefineShape3 tag with solid fill and line styles """
+    w = SWFWriter()
+    w.writeUI16(characterId)
+    w.writeRECT(-8000, 8000, -8000, 8000)
+    w.writeUI8(num_fill_styles)
+    for i in range(num_fill_styles):
+        w.writeUI8(0x00)
+        w.writeRGBA(rnd.getrandbits(32))
+    w.writeUI8(num_line_styles)
+    for i in range(num_line_styles):
+        w.writeUI16(rnd.randint(1, 100))
+        w.writeRGBA(rnd.getrandbits(32))
+    w.writeSHAPERECORDS(rnd, edges, num_fill_styles, num_line_styles)
+    return w.getvalue()
+
+def define_font(characterId, rnd, glyphs, edges=6, name=b"Synthetic"):
+    """
+    Return the body of a DefineFont2 tag with layout, wide offsets and
+    wide codes. Glyph i has code point 0x20 + i.
+    """
+    shapes = []
+    for i in range(glyphs):
+        w = SWFWriter()
+        w.writeSHAPERECORDS(rnd, edges, 1, 0, radius=500)
+        shapes.append(w.getvalue())
+
+    w = SWFWriter()
+    w.writeUI16(characterId)
+    w.writeUI8(0x80 | 0x08 | 0x04) # HasLayout, WideOffsets, WideCodes
+    w.writeUI8(1) # LanguageCode: Latin
+    w.writeUI8(len(name))
+    w.write(name)
+    w.writeUI16(glyphs)
+    offset = 4 * (glyphs + 1)
+    for shape in shapes:
+        w.writeUI32(offset)
+        offset += len(shape)
+    w.writeUI32(offset) # CodeTableOffset
+    for shape in shapes:
+        w.write(shape)
+    for i in range(glyphs):
+        w.writeUI16(0x20 + i)
+    w.writeSI16(900)
+    w.writeSI16(200)
+    w.writeSI16(0)
+    for i in range(glyphs):
+        w.writeSI16(rnd.randint(200, 1000))
+    for i in range(glyphs):
+        w.writeRECT(0, 1000, -900, 200)
+    w.writeUI16(0) # KerningCount
+    return w.getvalue()
+
+def define_text(characterId, rnd, fontId, glyphs, records=4, entries=20):
+    """ Return the body of a DefineText tag using the font fontId """
+    indices = [[rnd.randrange(glyphs) for j in range(entries)] for i in range(records)]
+    advances = [[rnd.randint(0, 1000) for j in range(entries)] for i in range(records)]
+
+    w = SWFWriter()
+    glyph_bits = max(w.calc_max_bits(False, [glyphs - 1]), 1)
+    advance_bits = w.calc_max_bits(True, [a for row in advances for a in row])
+    w.writeUI16(characterId)
+    w.writeRECT(0, 20000, 0, 2000 * records)
+    w.writeMATRIX()
+    w.writeUI8(glyph_bits)
+    w.writeUI8(advance_bits)
+    for i in range(records):
+        # TextRecordType, HasFont, HasColor, HasYOffset, HasXOffset
+        w.writeUI8(0x80 | 0x08 | 0x04 | 0x02 | 0x01)
+        w.writeUI16(fontId)
+        w.writeRGB(rnd.getrandbits(24))
+        w.writeSI16(0)
+        w.writeSI16(2000 * (i + 1))
+        w.writeUI16(480)
+        w.writeUI8(entries)
+        for index, advance in zip(indices[i], advances[i]):
+            w.writeUB(index, glyph_bits)
+            w.writeSB(advance, advance_bits)
+        w.align()
+    w.writeUI8(0)
+    return w.getvalue()
+
+def define_bits_lossless(characterId, rnd, width, height,
+                         format=BitmapFormat.BIT_24, alpha=True, colors=256):
+    """
+    Return the body of a DefineBitsLossless (alpha=False) or
+    DefineBitsLossless2 tag with pseudo random pixels.
+    BIT_15 is only available without alpha.
+    """
+    w = SWFWriter()
+    w.writeUI16(characterId)
+    w.writeUI8(format)
+    w.writeUI16(width)
+    w.writeUI16(height)
+    if format == BitmapFormat.BIT_8:
+        w.writeUI8(colors - 1)
+        palette = _random_bytes(rnd, colors * (4 if alpha else 3))
+        # the indices must be in the color table
+        pixels = bytearray(_rows(rnd, (width + 3) & ~3, height))
+        for i in range(len(pixels)):
+            pixels[i] %= colors
+        data = palette + bytes(pixels)
+    elif format == BitmapFormat.BIT_15:
+        if alpha:
+            raise ValueError("BIT_15 bitmaps can't have alpha")
+        pixels = bytearray(_rows(rnd, (width * 2 + 3) & ~3, height))
+        # the high bit of each big endian PIX15 is reserved
+        for i in range(0, len(pixels), 2):
+            pixels[i] &= 0x7f
+        data = bytes(pixels)
+    else:
+        data = _rows(rnd, width * 4, height)
+    w.write(zlib.compress(data))
+    return w.getvalue()
+
+def place_object(depth, characterId, rnd, name=None):
+    """ Return the body of a PlaceObject2 tag """
+    w = SWFWriter()
+    w.writeUI8(0x02 | 0x04 | (0x20 if name else 0))
+    w.writeUI16(depth)
+    w.writeUI16(characterId)
+    w.writeMATRIX(rnd.randint(0, 11000), rnd.randint(0, 8000))
+    if name:
+        w.writeString(name)
+    return w.getvalue()
+
+def define_sprite(characterId, placeCharacterId, rnd, frames=1):
+    """ Return the body of a DefineSprite placing placeCharacterId """
+    w = SWFWriter()
+    w.writeUI16(characterId)
+    w.writeUI16(frames)
+    if placeCharacterId is not None:
+        w.writeTAG(26, place_object(1, placeCharacterId, rnd))
+    for i in range(frames):
+        w.writeTAG(1, b"")
+    w.writeTAG(0, b"")
+    return w.getvalue()
+
+def sound_stream_head(samples):
+    """ Return the body of a SoundStreamHead2 tag for 44kHz 16 bit stereo PCM """
+    w = SWFWriter()
+    w.writeUB(0, 4)
+    w.writeUB(3, 2)
+    w.writeUB(1, 1)
+    w.writeUB(1, 1)
+    w.writeUB(3, 4) # uncompressed, little endian
+    w.writeUB(3, 2)
+    w.writeUB(1, 1)
+    w.writeUB(1, 1)
+    w.writeUI16(samples)
+    return w.getvalue()
+
+def define_video_stream(characterId, frames, width=160, height=120):
+    """ Return the body of a Sorenson H.263 DefineVideoStream tag """
+    return struct.pack("<HHHHBB", characterId, frames, width, height, 0, 2)
+
+def generate_tags(shapes=1, edges=100, fonts=0, glyphs=100, texts=0,
+                  bitmaps=0, bitmap_size=64, bitmap_format=BitmapFormat.BIT_24,
+                  sprites=0, nested_sprites=True, sound_blocks=0,
+                  video_frames=0, frames=1, frame_rate=24, seed=0, writer=None):
+    """
+    Write the tags of a movie (up to and including the End tag) and
+    return the writer and the number of frames. See generate().
+    """
+    rnd = random.Random(seed)
+    w = SWFWriter() if writer is None else writer
+    w.writeTAG(69, struct.pack("<I", 0x01)) # FileAttributes: UseNetwork
+    w.writeTAG(9, b"\xff\xff\xff") # SetBackgroundColor
+
+    characterId = 1
+    placements = []
+    shape_ids = []
+    for i in range(shapes):
+        w.writeTAG(32, define_shape(characterId, rnd, edges))
+        shape_ids.append(characterId)
+        placements.append(characterId)
+        characterId += 1
+
+    font_ids = []
+    for i in range(fonts):
+        w.writeTAG(48, define_font(characterId, rnd, glyphs))
+        font_ids.append(characterId)
+        characterId += 1
+
+    for i in range(texts if font_ids else 0):
+        w.writeTAG(11, define_text(characterId, rnd, font_ids[i % len(font_ids)], glyphs))
+        placements.append(characterId)
+        characterId += 1
+
+    for i in range(bitmaps):
+        alpha = bitmap_format != BitmapFormat.BIT_15
+        w.writeTAG(36 if alpha else 20, define_bits_lossless(
+            characterId, rnd, bitmap_size, bitmap_size, bitmap_format, alpha))
+        characterId += 1
+
+    inner = shape_ids[0] if shape_ids else None
+    for i in range(sprites):
+        w.writeTAG(39, define_sprite(characterId, inner, rnd))
+        if nested_sprites:
+            inner = characterId
+        else:
+            placements.append(characterId)
+        characterId += 1
+    if nested_sprites and sprites:
+        placements.append(characterId - 1)
+
+    video_id = None
+    if video_frames:
+        video_id = characterId
+        w.writeTAG(60, define_video_stream(video_id, video_frames))
+        characterId += 1
+
+    if sound_blocks:
+        samples = 44100 // frame_rate
+        w.writeTAG(45, sound_stream_head(samples))
+        block = _random_bytes(rnd, samples * 4 + 64)
+
+    frames = max(frames, sound_blocks, video_frames, 1)
+    for frame in range(frames):
+        if frame == 0:
+            for depth, placeId in enumerate(placements):
+                w.writeTAG(26, place_object(depth + 1, placeId, rnd))
+        if frame < sound_blocks:
+            # vary the payload a bit between blocks
+            offset = frame % 64
+            w.writeTAG(19, block[offset:offset + samples * 4])
+        if frame < video_frames:
+            w.writeTAG(61, struct.pack("<HH", video_id, frame) + _random_bytes(rnd, 32))
+        w.writeTAG(1, b"")
+    w.writeTAG(0, b"")
+    return w, frames
+
+def generate(kind="FWS", version=10, width=550, height=400, frame_rate=24, **kwargs):
+    """
+    Return the data of a synthetic SWF file.
+
+    @param kind : "FWS" (uncompressed), "CWS" (zlib) or "ZWS" (LZMA)
+    @param shapes : number of DefineShape3 tags
+    @param edges : number of edges of each shape
+    @param fonts : number of DefineFont2 tags
+    @param glyphs : number of glyphs of each font
+    @param texts : number of DefineText tags (needs fonts)
+    @param bitmaps : number of DefineBitsLossless(2) tags
+    @param bitmap_size : width and height of the bitmaps in pixels
+    @param bitmap_format : BitmapFormat of the bitmaps
+    @param sprites : number of DefineSprite tags
+    @param nested_sprites : whether each sprite places the previous one
+                            (a chain of depth sprites) or a shape
+    @param sound_blocks : number of SoundStreamBlock tags, one per frame
+    @param video_frames : number of VideoFrame tags, one per frame
+    @param frames : minimum number of frames
+    @param seed : random seed
+    """
+    w = SWFWriter()
+    w.writeRECT(0, width * 20, 0, height * 20)
+    w.writeFIXED8(frame_rate)
+    w.writeUI16(0) # frame count, patched below
+    header_length = len(w.getvalue())
+    w, frames = generate_tags(frame_rate=frame_rate, writer=w, **kwargs)
+    body = bytearray(w.getvalue())
+    struct.pack_into("<H", body, header_length - 2, min(frames, 0xffff))
+    body = bytes(body)
+
+    file_length = 8 + len(body)
+    if kind == "FWS":
+        return b"FWS" + struct.pack("<BI", version, file_length) + body
+    if kind == "CWS":
+        return b"CWS" + struct.pack("<BI", version, file_length) + zlib.compress(body)
+    if kind == "ZWS":
+        try:
+            import lzma
+        except ImportError:
+            from backports import lzma
+        # .lzma ("alone") format: 5 property bytes, 8 byte size, raw stream
+        data = lzma.compress(body, format=lzma.FORMAT_ALONE)
+        return b"ZWS" + struct.pack("<BII", version, file_length, len(data) - 13) + \
+            data[:5] + data[13:]
+    raise ValueError("unknown SWF kind %r" % kind)
+
+def write(path, kind="FWS", **kwargs):
+    """ Write a synthetic SWF file to path, see generate() """
+    data = generate(kind, **kwargs)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Write a synthetic SWF file")
+    parser.add_argument("path", help="Output file")
+    parser.add_argument("--kind", choices=["FWS", "CWS", "ZWS"], default="FWS")
+    parser.add_argument("--seed", type=int, default=0)
+    for option, default in (("shapes", 1), ("edges", 100), ("fonts", 0),
+            ("glyphs", 100), ("texts", 0), ("bitmaps", 0), ("bitmap-size", 64),
+            ("sprites", 0), ("sound-blocks", 0), ("video-frames", 0), ("frames", 1)):
+        parser.add_argument("--" + option, type=int, default=default)
+    parser.add_argument("--bitmap-format", type=int, default=BitmapFormat.BIT_24,
+                        choices=[BitmapFormat.BIT_8, BitmapFormat.BIT_15, BitmapFormat.BIT_24])
+    parser.add_argument("--flat-sprites", action="store_true",
+                        help="Place each sprite on the main timeline instead of nesting them")
+    options = vars(parser.parse_args())
+    path = options.pop("path")
+    options["nested_sprites"] = not options.pop("flat_sprites")
+    write(path, **options)
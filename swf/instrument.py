@@ -0,0 +1,98 @@
+"""
+Parse instrumentation
+
+Pass a ParseObserver to SWF(..., observer=...) (or set the observer
+attribute of a timeline before parse_tags) to be told about every tag
+body that gets decoded. ParseProfiler is an observer that aggregates
+count, payload bytes, wall time and bytes consumed per tag type.
+"""
+from __future__ import absolute_import
+import time
+
+try:
+    timer = time.perf_counter
+except AttributeError:
+    timer = time.time
+
+class ParseObserver(object):
+    """
+    Callback interface for parse instrumentation.
+    Subclass and override tag_parsed() to feed your own metrics.
+    """
+    def tag_parsed(self, tag, payload_bytes, seconds, bytes_read):
+        """
+        Called after a tag body was decoded.
+
+        @param tag : the decoded tag
+        @param payload_bytes : length of the tag body
+        @param seconds : wall time spent in tag.parse(). For sprites this
+                         includes the time spent on their control tags.
+        @param bytes_read : number of body bytes consumed by the read*
+                            methods (less than payload_bytes when a tag
+                            doesn't decode all of its body)
+        """
+        pass
+
+class TagParseStats(object):
+    """ Parse statistics of one tag type """
+    def __init__(self, type, name):
+        self.type = type
+        self.name = name
+        self.count = 0
+        self.payload_bytes = 0
+        self.bytes_read = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "type": self.type,
+            "name": self.name,
+            "count": self.count,
+            "payload_bytes": self.payload_bytes,
+            "bytes_read": self.bytes_read,
+            "seconds": self.seconds,
+        }
+
+    def __str__(self):
+        return "[%02d:%s] count: %d, payload: %d, read: %d, time: %.6fs" % (
+            self.type, self.name, self.count, self.payload_bytes,
+            self.bytes_read, self.seconds)
+
+class ParseProfiler(ParseObserver):
+    """
+    Aggregates parse statistics per tag type.
+
+    Pass another ParseObserver as @forward to have the events passed on
+    (e.g. to a metrics client) while profiling.
+    """
+    def __init__(self, forward=None):
+        self.forward = forward
+        self.stats = {}
+
+    def tag_parsed(self, tag, payload_bytes, seconds, bytes_read):
+        stats = self.stats.get(tag.type)
+        if stats is None:
+            stats = self.stats[tag.type] = TagParseStats(tag.type, tag.name)
+        stats.count += 1
+        stats.payload_bytes += payload_bytes
+        stats.bytes_read += bytes_read
+        stats.seconds += seconds
+        if self.forward is not None:
+            self.forward.tag_parsed(tag, payload_bytes, seconds, bytes_read)
+
+    def report(self):
+        """ Return the TagParseStats, slowest tag type first """
+        return sorted(self.stats.values(), key=lambda s: s.seconds, reverse=True)
+
+    def as_dict(self):
+        """ Return the report as a list of dicts (e.g. for JSON) """
+        return [s.as_dict() for s in self.report()]
+
+    def reset(self):
+        self.stats = {}
+
+    def __str__(self):
+        s = "[ParseProfiler]\n"
+        for stats in self.report():
+            s += "   " + stats.__str__() + "\n"
+        return s
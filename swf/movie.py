@@ -2,12 +2,34 @@
 SWF
 """
 from __future__ import absolute_import
-from .tag import SWFTimelineContainer
-from .stream import SWFStream
+from .tag import SWFTimelineContainer, TagTypeFilter
+from .tag import TagDefineSprite, TagFileAttributes, TagMetadata, TagSetBackgroundColor
+from .data import SWFRawTag
+from .stream import SWFStream, SWFBufferStream, SWFDecompressReader
 from .export import SVGExporter
+from .cache import load_tag_index, save_tag_index
 from six.moves import cStringIO
+from six import string_types
 from io import BytesIO
 
+def _lzma_decompressor(data):
+    """
+    Read the 5-byte LZMA properties (lc/lp/pb byte and dictionary size)
+    that precede a ZWS body and return a raw LZMA1 decompressor for it.
+    """
+    try:
+        import lzma
+    except ImportError:
+        from backports import lzma
+    props = data.readUI8()
+    dict_size = data.readUI32()
+    lc = props % 9
+    props //= 9
+    lp = props % 5
+    pb = props // 5
+    return lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=[{
+        "id": lzma.FILTER_LZMA1, "dict_size": dict_size, "lc": lc, "lp": lp, "pb": pb}])
+
 class SWFHeaderException(Exception):
     """ Exception raised in case of an invalid SWFHeader """
     def __init__(self, message):
@@ -91,13 +113,42 @@ class SWF(SWFTimelineContainer):
     editors.
     
     @param file: a file object with read(), seek(), tell() methods.
+    @param lazy: only index the tag headers while parsing and decode
+                 each tag body the first time the tag is accessed
+                 (the file has to stay open until then).
+    @param index_cache: keep the tag index of files on disk (see swf.cache)
+                 and reuse it instead of scanning the tag headers.
+                 True stores it next to the file, a string names a
+                 cache directory (where entries are shared by files
+                 with the same contents).
+    @param include: tag types or tag classes to decode, all other tags
+                 are skipped and kept as raw header records (SWFRawTag).
+    @param exclude: tag types or tag classes not to decode.
+    @param observer: a swf.instrument.ParseObserver (e.g. a ParseProfiler)
+                 that is told about every tag body decoded.
+    @param compact_shapes: store the records of shapes, glyphs and morph
+                 shapes in a swf.data.SWFShapeRecordTable (a few arrays)
+                 instead of one object per record.
+    @param shape_handler: a swf.data.SWFShapeRecordHandler the records of
+                 shapes, glyphs and morph shapes are passed to as they are
+                 read. They are not stored then.
     """
-    def __init__(self, file=None):
+    compact_shapes = False
+    shape_handler = None
+    def __init__(self, file=None, lazy=False, index_cache=None, include=None, exclude=None,
+                 observer=None, compact_shapes=False, shape_handler=None):
         super(SWF, self).__init__()
+        self.lazy = lazy
+        self.compact_shapes = compact_shapes
+        self.shape_handler = shape_handler
+        self.index_cache = index_cache
+        self.observer = observer
+        if include is not None or exclude is not None:
+            self.tag_filter = TagTypeFilter(include, exclude)
         self._data = None if file is None else SWFStream(file)
         self._header = None
         if self._data is not None:
-            self.parse(self._data)
+            self.parse(self._data, getattr(file, 'name', None))
     
     @property
     def data(self):
@@ -130,36 +181,95 @@ class SWF(SWFTimelineContainer):
             raise Exception("This SWF doesn't contain any tags!")
         return exporter.export(self, force_stroke)
             
-    def parse_file(self, filename):
-        """ Parses the SWF from a filename """
-        self.parse(open(filename, 'rb'))
+    def parse_file(self, filename, use_mmap=False):
+        """
+        Parses the SWF from a filename
+
+        @param use_mmap : memory map the file and parse straight from the
+                          mapping. Tag payloads of uncompressed (FWS) files
+                          are then memoryview slices of the map, so only
+                          the pages that are actually touched get loaded.
+        """
+        f = open(filename, 'rb')
+        if not use_mmap:
+            self.parse(f, filename)
+            return
+        import mmap
+        with f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                data = f.read()
+        self.parse(SWFBufferStream(data), filename)
         
-    def parse(self, data):
+    def parse(self, data, filename=None):
         """ 
         Parses the SWF.
         
-        The @data parameter can be a file object or a SWFStream
+        The @data parameter can be a file object or a SWFStream,
+        @filename is the file it was opened from (used by index_cache)
         """
+        index = None
+        if self.index_cache and isinstance(filename, string_types):
+            index = load_tag_index(filename, self.index_cache)
+        data = self._parse_header(data)
+        self.parse_tags(data, index=index)
+        if self.index_cache and index is None and isinstance(filename, string_types):
+            save_tag_index(filename, self.tag_index, self.index_cache)
+
+    @classmethod
+    def iter_tags(cls, file, recurse=True, include=None, exclude=None, compact_shapes=False,
+                  shape_handler=None):
+        """
+        Generator over the tags of a SWF that doesn't keep them in memory.
+
+        Yields (tag, sprite, frame) tuples: sprite is the DefineSprite
+        the tag belongs to (None on the main timeline) and frame is the
+        0-based frame number within that timeline. With @recurse the
+        control tags of each sprite follow the sprite itself (which then
+        has no tags of its own). @include / @exclude filter the tags
+        that get decoded, @compact_shapes selects the shape record
+        storage and @shape_handler streams the shape records, like for
+        SWF().
+
+        @param file: a filename or a file object
+        """
+        swf = cls(include=include, exclude=exclude, compact_shapes=compact_shapes,
+                  shape_handler=shape_handler)
+        f = open(file, 'rb') if isinstance(file, string_types) else file
+        try:
+            data = swf._parse_header(f)
+            for item in swf.iter_parse_tags(data, recurse):
+                yield item
+        finally:
+            if f is not file:
+                f.close()
+
+    def _parse_header(self, data, chunk_size=SWFDecompressReader.CHUNK_SIZE):
+        """ Parse the header and return the (decompressed) tag stream """
         self._data = data = data if isinstance(data, SWFStream) else SWFStream(data)
         self._header = SWFHeader(self._data)
         if self._header.compressed:
-            temp = BytesIO()
+            # lazy tags seek back to their bodies, so keep what was inflated
+            history = None if self.lazy else chunk_size
             if self._header.compressed_zlib:
                 import zlib
-                data = data.f.read()
-                zip = zlib.decompressobj()
-                temp.write(zip.decompress(data))
+                # inflate incrementally, as the tags are read
+                data = SWFStream(SWFDecompressReader(data, zlib.decompressobj(),
+                    self._header.file_length - 8, history, chunk_size))
             else:
-                import pylzma
                 data.readUI32() #consume compressed length
-                data = data.f.read()
-                temp.write(pylzma.decompress(data))
-            temp.seek(0)
-            data = SWFStream(temp)
-        self._header._frame_size = data.readRECT()
-        self._header._frame_rate = data.readFIXED8()
-        self._header._frame_count = data.readUI16()
-        self.parse_tags(data)
+                data = SWFStream(SWFDecompressReader(data, _lzma_decompressor(data),
+                    self._header.file_length - 8, history, chunk_size))
+            self._header._frame_size = data.readRECT()
+            self._header._frame_rate = data.readFIXED8()
+            self._header._frame_count = data.readUI16()
+        if self.compact_shapes:
+            data.compact_shapes = True
+        if self.shape_handler is not None:
+            data.shape_handler = self.shape_handler
+        return data
         
     def __str__(self):
         s = "[SWF]\n"
@@ -167,4 +277,67 @@ class SWF(SWFTimelineContainer):
         for tag in self.tags:
             s += tag.__str__() + "\n"
         return s
-        
+
+class SWFProbe(object):
+    """
+    Result of probe(): the SWFHeader and, when asked for, the file
+    attributes, background color and metadata from the first tags.
+    """
+    def __init__(self, header):
+        self.header = header
+        self.file_attributes = None
+        self.background_color = None
+        self.metadata = None
+
+    def __str__(self):
+        s = "[SWFProbe]\n" + self.header.__str__()
+        if self.file_attributes is not None:
+            s += "   %s\n" % self.file_attributes.__str__()
+        if self.background_color is not None:
+            s += "   BackgroundColor: #%06x\n" % (self.background_color & 0xffffff)
+        if self.metadata is not None:
+            s += "   Metadata: %d chars\n" % len(self.metadata)
+        return s
+
+# the tags probe() looks for, and the other tags that may precede
+# them at the start of a SWF (ScriptLimits, ProductInfo, Protect,
+# EnableDebugger, EnableDebugger2, DebugID)
+_PROBE_TAGS = (TagFileAttributes, TagSetBackgroundColor, TagMetadata)
+_PROBE_PREAMBLE = frozenset([t.TYPE for t in _PROBE_TAGS] + [65, 41, 24, 58, 64, 63])
+
+def probe(path, tags=False):
+    """
+    Read the header of a SWF without parsing its tags.
+
+    Compressed files are only inflated as far as the frame size, rate
+    and count. With @tags set the FileAttributes, SetBackgroundColor and
+    Metadata tags are read as well, from the run of file-level tags at
+    the start of the SWF (scanning stops at the first other tag).
+
+    @param path: a filename or a file object
+    @return a SWFProbe
+    """
+    swf = SWF(include=_PROBE_TAGS, exclude=[TagDefineSprite])
+    f = open(path, 'rb') if isinstance(path, string_types) else path
+    try:
+        # small chunks: only a few dozen bytes are needed in most cases
+        data = swf._parse_header(f, chunk_size=512)
+        result = SWFProbe(swf.header)
+        if not tags:
+            return result
+        for tag, sprite, frame in swf.iter_parse_tags(data, recurse=False):
+            if isinstance(tag, TagFileAttributes):
+                result.file_attributes = tag
+            elif isinstance(tag, TagSetBackgroundColor):
+                result.background_color = tag.color
+            elif isinstance(tag, TagMetadata):
+                result.metadata = tag.xmlString
+            elif not isinstance(tag, SWFRawTag) or tag.header.type not in _PROBE_PREAMBLE:
+                break
+            if result.file_attributes is not None and result.metadata is not None \
+                    and result.background_color is not None:
+                break
+        return result
+    finally:
+        if f is not path:
+            f.close()
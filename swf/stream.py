@@ -11,6 +11,13 @@ class SWFStream(object):
     SWF File stream
     """
     FLOAT16_EXPONENT_BASE = 15
+
+    # parse options, passed on to substreams
+    OPTIONS = ("compact_shapes", "shape_handler")
+    # store shape records in a SWFShapeRecordTable instead of a list of objects
+    compact_shapes = False
+    # SWFShapeRecordHandler to pass shape records to instead of storing them
+    shape_handler = None
     
     def __init__(self, file):
         """ Initialize with a file object """
@@ -26,19 +33,17 @@ class SWFStream(object):
     def calc_max_bits(self, signed, values):
         """ Calculates the maximim needed bits to represent a value """
         b = 0
-        vmax = -10000000
-        
+        negative = False
+
         for val in values:
-            if signed:
-                b = b | val if val >= 0 else b | ~val << 1
-                vmax = val if vmax < val else vmax
-            else:
-                b |= val;
-        bits = 0
-        if b > 0:
-            bits = len(self.bin(b)) - 2
-            if signed and vmax > 0 and len(self.bin(vmax)) - 2 >= bits:
-                bits += 1
+            if signed and val < 0:
+                negative = True
+                val = ~val
+            b |= val
+        bits = len(bin(b)) - 2 if b > 0 else 0
+        if signed and (b > 0 or negative):
+            # sign bit
+            bits += 1
         return bits
     
     def close(self):
@@ -51,7 +56,7 @@ class SWFStream(object):
     
     def _read_bytes_aligned(self, bytes):
         buf = self.f.read(bytes)
-        return reduce(lambda x, y: x << 8 | y, buf, 0)
+        return reduce(lambda x, y: x << 8 | y, bytearray(buf), 0)
     
     def readbits(self, bits):
         """
@@ -152,6 +157,27 @@ class SWFStream(object):
         self.reset_bits_pending();
         return struct.unpack('<Q', self.f.read(8))[0]
     
+    def peekUI8(self):
+        """ Read a unsigned byte without advancing the stream """
+        pos = self.tell()
+        value = self.readUI8()
+        self.seek(pos)
+        return value
+
+    def peekUI16(self):
+        """ Read a unsigned short without advancing the stream """
+        pos = self.tell()
+        value = self.readUI16()
+        self.seek(pos)
+        return value
+
+    def peekUI32(self):
+        """ Read a unsigned int without advancing the stream """
+        pos = self.tell()
+        value = self.readUI32()
+        self.seek(pos)
+        return value
+
     def readEncodedU32(self):
         """ Read a encoded unsigned int """
         self.reset_bits_pending();
@@ -263,17 +289,62 @@ class SWFStream(object):
     def readSTYLECHANGERECORD(self, states, fill_bits, line_bits, level = 1):
         """ Read a SWFShapeRecordStyleChange """
         return SWFShapeRecordStyleChange(self, states, fill_bits, line_bits, level)
-        
+
+    def readSHAPERECORDS(self, fill_bits, line_bits, level=1, handler=None):
+        """
+        Read shape records up to and including the end record and pass
+        them to @handler, a SWFShapeRecordHandler (by default a new
+        SWFShapeRecordTable). Returns the handler.
+        """
+        if handler is None:
+            handler = SWFShapeRecordTable()
+        while True:
+            if self.readUB(1) == 1:
+                if self.readUB(1) == 1:
+                    num_bits = self.readUB(4) + 2
+                    if self.readUB(1) == 1:
+                        dx = self.readSB(num_bits)
+                        handler.on_line(num_bits, SWFShapeRecordTable.FLAG_GENERAL_LINE, dx, self.readSB(num_bits))
+                    elif self.readUB(1) == 1:
+                        handler.on_line(num_bits, SWFShapeRecordTable.FLAG_VERT_LINE, 0, self.readSB(num_bits))
+                    else:
+                        handler.on_line(num_bits, 0, self.readSB(num_bits), 0)
+                else:
+                    num_bits = self.readUB(4) + 2
+                    control_dx = self.readSB(num_bits)
+                    control_dy = self.readSB(num_bits)
+                    anchor_dx = self.readSB(num_bits)
+                    handler.on_curve(num_bits, control_dx, control_dy, anchor_dx, self.readSB(num_bits))
+            else:
+                states = self.readUB(5)
+                if states == 0:
+                    handler.on_end()
+                    return handler
+                record = self.readSTYLECHANGERECORD(states, fill_bits, line_bits, level)
+                fill_bits = record.num_fillbits
+                line_bits = record.num_linebits
+                self._on_style_change_record(handler, states, record)
+
+    def _on_style_change_record(self, handler, states, record):
+        """ Pass a SWFShapeRecordStyleChange on to handler """
+        handler.on_style_change(states,
+            record.move_deltaX if record.state_moveto else 0,
+            record.move_deltaY if record.state_moveto else 0,
+            record.fill_style0, record.fill_style1, record.line_style,
+            record.num_fillbits, record.num_linebits,
+            record.fill_styles if record.state_new_styles else None,
+            record.line_styles if record.state_new_styles else None)
+
     def readFILLSTYLE(self, level=1):
         """ Read a SWFFillStyle """
         return SWFFillStyle(self, level)
     
     def readTEXTRECORD(self, glyphBits, advanceBits, previousRecord=None, level=1):
         """ Read a SWFTextRecord """
-        if self.readUI8() == 0:
+        if self.peekUI8() == 0:
+            self.readUI8() # consume the EndOfRecordsFlag
             return None
         else:
-            self.seek(self.tell() - 1)
             return SWFTextRecord(self, glyphBits, advanceBits, previousRecord, level)
             
     def readLINESTYLE(self, level=1):
@@ -332,12 +403,11 @@ class SWFStream(object):
     
     def readCLIPACTIONRECORD(self, version):
         """ Read a SWFClipActionRecord """
-        pos = self.tell()
-        flags = self.readUI32() if version >= 6 else self.readUI16()
+        flags = self.peekUI32() if version >= 6 else self.peekUI16()
         if flags == 0:
+            self.skip_bytes(4 if version >= 6 else 2) # consume the ClipActionEndFlag
             return None
         else:
-            self.seek(pos)
             return SWFClipActionRecord(self, version)
             
     def readCLIPEVENTFLAGS(self, version):
@@ -467,6 +537,21 @@ class SWFStream(object):
             tag_length = self.readSI32();
         return SWFRecordHeader(tag_type_and_length >> 6, tag_length, self.tell() - pos)
     
+    def readsubstream(self, length):
+        """
+        Read the specified number of bytes and return them as a
+        SWFBufferStream positioned at the first byte.
+        """
+        self.reset_bits_pending()
+        return self._inherit_options(SWFBufferStream(self.f.read(length)))
+
+    def _inherit_options(self, stream):
+        """ Pass the parse options set on this stream on to stream """
+        for name in self.OPTIONS:
+            if name in self.__dict__:
+                setattr(stream, name, self.__dict__[name])
+        return stream
+
     def skip_bytes(self, length):
         """ Skip over the specified number of bytes """
         self.f.seek(self.tell() + length)
@@ -478,6 +563,11 @@ class SWFStream(object):
     def read(self, count=0):
         """ Read """
         return self.f.read(count) if count > 0 else self.f.read()
+
+    def readview(self, count=0):
+        """ Read the specified number of bytes as a memoryview """
+        self.reset_bits_pending()
+        return memoryview(self.read(count))
         
     def seek(self, pos, whence=0):
         """ Seek """
@@ -486,7 +576,448 @@ class SWFStream(object):
     def tell(self):
         """ Tell """
         return self.f.tell()
+
+    def at_end(self):
+        """ Return True if there is nothing left to read """
+        pos = self.f.tell()
+        if len(self.f.read(1)) == 0:
+            return True
+        self.f.seek(pos)
+        return False
         
+try:
+    _int_from_bytes = int.from_bytes
+except AttributeError:
+    # Python 2
+    import binascii
+    def _int_from_bytes(data, byteorder):
+        """ int.from_bytes() for big endian bytes, str or bytearray """
+        return int(binascii.hexlify(data), 16) if len(data) > 0 else 0
+
+_UB_MASKS = [(1 << x) - 1 for x in range(65)]
+_SB_SIGNS = [0] + [1 << (x - 1) for x in range(1, 65)]
+
+_SI8 = struct.Struct('<b')
+_UI8 = struct.Struct('<B')
+_SI16 = struct.Struct('<h')
+_UI16 = struct.Struct('<H')
+_SI32 = struct.Struct('<i')
+_UI32 = struct.Struct('<I')
+_UI64 = struct.Struct('<Q')
+_FLOAT = struct.Struct('<f')
+
+class SWFBufferStream(SWFStream):
+    """
+    SWF stream over an in-memory buffer
+
+    Works on a single bytes, bytearray or mmap object (or a window into
+    one) with an integer bit cursor instead of per-byte file reads.
+    The read* API is identical to SWFStream. Sub-streams created with
+    readsubstream() share the buffer instead of copying it.
+    """
+    def __init__(self, buffer, start=0, end=None):
+        """ Initialize with a buffer and an optional [start, end) window """
+        super(SWFBufferStream, self).__init__(None)
+        if not hasattr(buffer, 'find'):
+            # memoryview and friends can't search for the string terminator
+            buffer = buffer.tobytes() if isinstance(buffer, memoryview) else bytes(buffer)
+        self._buffer = buffer
+        self._start = start
+        self._end = len(buffer) if end is None else end
+        self._bitpos = start << 3
+
+    @property
+    def buffer(self):
+        """ Return the underlying buffer """
+        return self._buffer
+
+    def _align(self):
+        """ Align the cursor to the next byte and return the byte position """
+        pos = (self._bitpos + 7) >> 3
+        self._bitpos = pos << 3
+        return pos
+
+    def _take(self, count):
+        """ Align and advance over count bytes, returning the start position """
+        pos = (self._bitpos + 7) >> 3
+        if pos + count > self._end:
+            raise EOFError
+        self._bitpos = (pos + count) << 3
+        return pos
+
+    def readbits(self, bits):
+        """
+        Read the specified number of bits from the stream.
+        Returns 0 for bits == 0.
+        """
+        if bits == 0:
+            return 0
+        bitpos = self._bitpos
+        first = bitpos >> 3
+        last = (bitpos + bits + 7) >> 3
+        if last > self._end:
+            raise EOFError
+        self._bitpos = bitpos + bits
+        value = _int_from_bytes(self._buffer[first:last], 'big')
+        return (value >> ((last << 3) - bitpos - bits)) & _UB_MASKS[bits]
+
+    def readSB(self, bits):
+        """ Read a signed int using the specified number of bits """
+        value = self.readbits(bits)
+        if value & _SB_SIGNS[bits]:
+            value -= 1 << bits
+        return value
+
+    def readUB(self, bits):
+        """ Read a unsigned int using the specified number of bits """
+        return self.readbits(bits)
+
+    def readSI8(self):
+        """ Read a signed byte """
+        return _SI8.unpack_from(self._buffer, self._take(1))[0]
+
+    def readUI8(self):
+        """ Read a unsigned byte """
+        return _UI8.unpack_from(self._buffer, self._take(1))[0]
+
+    def readSI16(self):
+        """ Read a signed short """
+        return _SI16.unpack_from(self._buffer, self._take(2))[0]
+
+    def readUI16(self):
+        """ Read a unsigned short """
+        return _UI16.unpack_from(self._buffer, self._take(2))[0]
+
+    def readSI32(self):
+        """ Read a signed int """
+        return _SI32.unpack_from(self._buffer, self._take(4))[0]
+
+    def readUI32(self):
+        """ Read a unsigned int """
+        return _UI32.unpack_from(self._buffer, self._take(4))[0]
+
+    def readUI64(self):
+        """ Read a uint64_t """
+        return _UI64.unpack_from(self._buffer, self._take(8))[0]
+
+    def readFLOAT(self):
+        """ Read a float """
+        return _FLOAT.unpack_from(self._buffer, self._take(4))[0]
+
+    def peekUI8(self):
+        """ Read a unsigned byte without advancing the stream """
+        pos = self._align()
+        if pos + 1 > self._end:
+            raise EOFError
+        return _UI8.unpack_from(self._buffer, pos)[0]
+
+    def peekUI16(self):
+        """ Read a unsigned short without advancing the stream """
+        pos = self._align()
+        if pos + 2 > self._end:
+            raise EOFError
+        return _UI16.unpack_from(self._buffer, pos)[0]
+
+    def peekUI32(self):
+        """ Read a unsigned int without advancing the stream """
+        pos = self._align()
+        if pos + 4 > self._end:
+            raise EOFError
+        return _UI32.unpack_from(self._buffer, pos)[0]
+
+    def readString(self):
+        """ Read a string """
+        pos = self._align()
+        end = self._buffer.find(b"\0", pos, self._end)
+        if end < 0:
+            raise EOFError
+        self._bitpos = (end + 1) << 3
+        return bytes(self._buffer[pos:end]).decode()
+
+    def readSHAPERECORDS(self, fill_bits, line_bits, level=1, handler=None):
+        """
+        Read shape records up to and including the end record and pass
+        them to @handler, a SWFShapeRecordHandler (by default a new
+        SWFShapeRecordTable). Returns the handler.
+
+        Decodes straight from the buffer in one loop: a window of up to
+        64 bytes is loaded into an int at a time and the records are
+        taken from it with shifts and masks (a record is at most 118
+        bits without new styles). Only style change records with new
+        style arrays go through readSTYLECHANGERECORD.
+        """
+        if handler is None:
+            handler = SWFShapeRecordTable()
+        buf = self._buffer
+        end = self._end
+        bitpos = self._bitpos
+        masks = _UB_MASKS
+        signs = _SB_SIGNS
+        from_bytes = _int_from_bytes
+        on_line = handler.on_line
+        on_curve = handler.on_curve
+        on_style_change = handler.on_style_change
+        GENERAL_LINE = SWFShapeRecordTable.FLAG_GENERAL_LINE
+        VERT_LINE = SWFShapeRecordTable.FLAG_VERT_LINE
+        fill_mask = masks[fill_bits]
+        line_mask = masks[line_bits]
+        while True:
+            pos = bitpos >> 3
+            stop = min(pos + 64, end)
+            window = from_bytes(buf[pos:stop], 'big')
+            # bits left in the window, records end at bit 0
+            left = ((stop - pos) << 3) - (bitpos & 7)
+            # unless the window reaches the end of the buffer, leave the
+            # rest for the next one when a record might not fit
+            limit = -1 if stop == end else 128
+            while left > limit:
+                left -= 6
+                if left < 0:
+                    raise EOFError
+                head = (window >> left) & 0x3f
+                if head & 0x20:
+                    num_bits = (head & 0xf) + 2
+                    mask = masks[num_bits]
+                    sign = signs[num_bits]
+                    if head & 0x10:
+                        left -= 1
+                        if left < 0:
+                            raise EOFError
+                        if (window >> left) & 1:
+                            left -= num_bits << 1
+                            if left < 0:
+                                raise EOFError
+                            value = window >> left
+                            on_line(num_bits, GENERAL_LINE, (((value >> num_bits) & mask) ^ sign) - sign,
+                                    ((value & mask) ^ sign) - sign)
+                        else:
+                            left -= num_bits + 1
+                            if left < 0:
+                                raise EOFError
+                            value = window >> left
+                            delta = ((value & mask) ^ sign) - sign
+                            if (value >> num_bits) & 1:
+                                on_line(num_bits, VERT_LINE, 0, delta)
+                            else:
+                                on_line(num_bits, 0, delta, 0)
+                    else:
+                        left -= num_bits << 2
+                        if left < 0:
+                            raise EOFError
+                        value = window >> left
+                        on_curve(num_bits,
+                                 (((value >> 3 * num_bits) & mask) ^ sign) - sign,
+                                 (((value >> 2 * num_bits) & mask) ^ sign) - sign,
+                                 (((value >> num_bits) & mask) ^ sign) - sign,
+                                 ((value & mask) ^ sign) - sign)
+                    continue
+                states = head & 0x1f
+                if states == 0:
+                    self._bitpos = (stop << 3) - left
+                    handler.on_end()
+                    return handler
+                if states & 0x10:
+                    # new style arrays: byte aligned, let the record read them
+                    self._bitpos = (stop << 3) - left
+                    record = self.readSTYLECHANGERECORD(states, fill_bits, line_bits, level)
+                    fill_bits = record.num_fillbits
+                    line_bits = record.num_linebits
+                    fill_mask = masks[fill_bits]
+                    line_mask = masks[line_bits]
+                    self._on_style_change_record(handler, states, record)
+                    bitpos = self._bitpos
+                    break
+                move_dx = move_dy = 0
+                if states & 0x1:
+                    left -= 5
+                    if left < 0:
+                        raise EOFError
+                    move_bits = (window >> left) & 0x1f
+                    left -= move_bits << 1
+                    if left < 0:
+                        raise EOFError
+                    value = window >> left
+                    mask = masks[move_bits]
+                    sign = signs[move_bits]
+                    move_dx = (((value >> move_bits) & mask) ^ sign) - sign
+                    move_dy = ((value & mask) ^ sign) - sign
+                fill_style0 = fill_style1 = line_style = 0
+                if states & 0x2:
+                    left -= fill_bits
+                    if left < 0:
+                        raise EOFError
+                    fill_style0 = (window >> left) & fill_mask
+                if states & 0x4:
+                    left -= fill_bits
+                    if left < 0:
+                        raise EOFError
+                    fill_style1 = (window >> left) & fill_mask
+                if states & 0x8:
+                    left -= line_bits
+                    if left < 0:
+                        raise EOFError
+                    line_style = (window >> left) & line_mask
+                on_style_change(states, move_dx, move_dy, fill_style0, fill_style1,
+                                line_style, fill_bits, line_bits, None, None)
+            else:
+                bitpos = (stop << 3) - left
+
+    def readsubstream(self, length):
+        """
+        Return a SWFBufferStream over the next length bytes of this
+        buffer (without copying) and skip past them.
+        """
+        pos = self._take(length)
+        return self._inherit_options(SWFBufferStream(self._buffer, pos, pos + length))
+
+    def skip_bytes(self, length):
+        """ Skip over the specified number of bytes """
+        self._bitpos = (self.tell() + length + self._start) << 3
+
+    def reset_bits_pending(self):
+        """ Reset the bit array """
+        self._align()
+
+    def read(self, count=0):
+        """ Read """
+        pos = self._align()
+        end = min(pos + count, self._end) if count > 0 else self._end
+        self._bitpos = end << 3
+        return bytes(self._buffer[pos:end])
+
+    def readview(self, count=0):
+        """
+        Read the specified number of bytes as a memoryview slice of the
+        underlying buffer (no copy is made)
+        """
+        pos = self._align()
+        end = min(pos + count, self._end) if count > 0 else self._end
+        self._bitpos = end << 3
+        return memoryview(self._buffer)[pos:end]
+
+    def seek(self, pos, whence=0):
+        """ Seek """
+        if whence == 1:
+            pos += self.tell()
+        elif whence == 2:
+            pos += self._end - self._start
+        self._bitpos = (self._start + pos) << 3
+
+    def tell(self):
+        """ Tell """
+        return ((self._bitpos + 7) >> 3) - self._start
+
+    def at_end(self):
+        """ Return True if there is nothing left to read """
+        return ((self._bitpos + 7) >> 3) >= self._end
+
+class SWFDecompressReader(object):
+    """
+    Read-only file object that decompresses on demand
+
+    Wraps the compressed body of a SWF and a zlib or lzma decompressor
+    object, and only inflates as many bounded chunks as the reads ask
+    for. Just a window of already returned data is retained, so the
+    tag parser can step back over a record header, but not to the start
+    (unless history is None, then everything inflated so far is kept).
+    Seeking forward inflates (and drops) the data in between; seeking to
+    the end uses the declared length instead of inflating anything. The
+    length in a SWF header is often wrong, so reads don't stop there:
+    they return whatever the compressed data actually inflates to.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, source, decompressor, length=None, history=CHUNK_SIZE,
+                 chunk_size=CHUNK_SIZE):
+        """
+        @param source : the compressed data, an object with read(count)
+        @param decompressor : a zlib.decompressobj() or lzma decompressor
+        @param length : the declared uncompressed length, if known; only
+                        a hint for seek(0, 2), reads aren't bounded by it
+        @param history : number of bytes retained behind the read position,
+                         or None to retain everything
+        @param chunk_size : number of bytes read from the source and
+                            inflated at a time
+        """
+        self.source = source
+        self.decompressor = decompressor
+        self.length = length
+        self.history = history
+        self.chunk_size = chunk_size
+        self._input = b""
+        self._buffer = bytearray()
+        self._offset = 0 # stream position of self._buffer[0]
+        self._pos = 0
+        self._done = False
+
+    def _needs_input(self):
+        # lzma keeps unconsumed input internally, zlib hands it back
+        return getattr(self.decompressor, 'needs_input', not self._input)
+
+    def _fill(self, end):
+        """ Decompress until the buffer reaches stream position end """
+        d = self.decompressor
+        while self._offset + len(self._buffer) < end and not self._done:
+            if not self._input and self._needs_input():
+                self._input = self.source.read(self.chunk_size)
+                if not self._input:
+                    # truncated stream, return whatever is left
+                    if hasattr(d, 'flush'):
+                        self._buffer += d.flush()
+                    self._done = True
+                    break
+            self._buffer += d.decompress(self._input, self.chunk_size)
+            self._input = getattr(d, 'unconsumed_tail', b"")
+            # Python 2's zlib has no eof, unused_data shows the end there
+            if getattr(d, 'eof', False) or getattr(d, 'unused_data', b""):
+                self._done = True
+            # drop what is behind the retained window
+            if self.history is None:
+                continue
+            drop = min(self._pos - self._offset - self.history, len(self._buffer))
+            if drop > self.chunk_size:
+                del self._buffer[:drop]
+                self._offset += drop
+
+    def read(self, count=-1):
+        """ Read count bytes, or everything up to the end of the stream """
+        if count is None or count < 0:
+            self._fill(float('inf'))
+            end = self._offset + len(self._buffer)
+        else:
+            end = self._pos + count
+            self._fill(end)
+        start = self._pos - self._offset
+        if start < 0:
+            raise IOError("can't read before the retained window")
+        # the view mustn't outlive this line, the buffer gets resized
+        data = memoryview(self._buffer)[start:end - self._offset].tobytes()
+        self._pos += len(data)
+        return data
+
+    def seek(self, pos, whence=0):
+        """ Seek """
+        if whence == 1:
+            pos += self._pos
+        elif whence == 2:
+            if self.length is None:
+                self._fill(float('inf'))
+                self.length = self._offset + len(self._buffer)
+            pos += self.length
+        if pos < self._offset:
+            raise IOError("can't seek before the retained window")
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        """ Tell """
+        return self._pos
+
+    def close(self):
+        """ Close """
+        self._buffer = bytearray()
+        self._input = b""
+
 def int32(x):
     """ Return a signed or unsigned int """
     if x>0xFFFFFFFF:
@@ -3,6 +3,8 @@ from .consts import *
 from .data import *
 from .utils import *
 from .stream import *
+from .instrument import timer
+from . import bitmap as _bitmap
 import datetime
 from six.moves import range
 try:
@@ -10,73 +12,53 @@ try:
 except ImportError:
     from PIL import Image
 import struct
+from array import array
 from io import BytesIO
 
+def payload_property(name, doc=None, wrap=BytesIO):
+    """
+    Return a property exposing the memoryview stored in <name>View as a
+    file object (or whatever @wrap makes of the view). The BytesIO is
+    only created (and the payload copied) the first time the property is
+    read, so tags parsed from a memory mapped file don't pull their
+    payloads into memory until asked to.
+    """
+    view_name = name + "View"
+    file_name = "_" + name
+    def fget(self):
+        f = getattr(self, file_name, None)
+        if f is None:
+            f = wrap(getattr(self, view_name))
+            setattr(self, file_name, f)
+        return f
+    def fset(self, value):
+        setattr(self, file_name, value)
+    return property(fget, fset, doc=doc)
 
 class TagFactory(object):
+    """
+    Creates tags by type.
+    The registry of tag types (TagFactory.TAGS) is filled in at the end
+    of this module, and can be extended with register().
+    """
+    TAGS = {}
+
+    @classmethod
+    def register(cls, tag_class):
+        """ Register a tag class under its TYPE """
+        cls.TAGS[tag_class.TYPE] = tag_class
+        return tag_class
+
+    @classmethod
+    def tag_class(cls, type):
+        """ Return the tag class for an integer tag type (or None) """
+        return cls.TAGS.get(type)
+
     @classmethod
     def create(cls, type):
         """ Return the created tag by specifying an integer """
-        if type == 0: return TagEnd()
-        elif type == 1: return TagShowFrame()
-        elif type == 2: return TagDefineShape()
-        elif type == 4: return TagPlaceObject()
-        elif type == 5: return TagRemoveObject()
-        elif type == 6: return TagDefineBits()
-        elif type == 7: return TagDefineButton()
-        elif type == 8: return TagJPEGTables()
-        elif type == 9: return TagSetBackgroundColor()
-        elif type == 10: return TagDefineFont()
-        elif type == 11: return TagDefineText()
-        elif type == 12: return TagDoAction()
-        elif type == 13: return TagDefineFontInfo()
-        elif type == 14: return TagDefineSound()
-        elif type == 15: return TagStartSound()
-        elif type == 17: return TagDefineButtonSound()
-        elif type == 18: return TagSoundStreamHead()
-        elif type == 19: return TagSoundStreamBlock()
-        elif type == 20: return TagDefineBitsLossless()
-        elif type == 21: return TagDefineBitsJPEG2()
-        elif type == 22: return TagDefineShape2()
-        elif type == 24: return TagProtect()
-        elif type == 26: return TagPlaceObject2()
-        elif type == 28: return TagRemoveObject2()
-        elif type == 32: return TagDefineShape3()
-        elif type == 33: return TagDefineText2()
-        elif type == 34: return TagDefineButton2()
-        elif type == 35: return TagDefineBitsJPEG3()
-        elif type == 36: return TagDefineBitsLossless2()
-        elif type == 37: return TagDefineEditText()
-        elif type == 39: return TagDefineSprite()
-        elif type == 41: return TagProductInfo()
-        elif type == 43: return TagFrameLabel()
-        elif type == 45: return TagSoundStreamHead2()
-        elif type == 46: return TagDefineMorphShape()
-        elif type == 48: return TagDefineFont2()
-        elif type == 56: return TagExportAssets()
-        elif type == 58: return TagEnableDebugger()
-        elif type == 59: return TagDoInitAction()
-        elif type == 60: return TagDefineVideoStream()
-        elif type == 61: return TagVideoFrame()
-        elif type == 63: return TagDebugID()
-        elif type == 64: return TagEnableDebugger2()
-        elif type == 65: return TagScriptLimits()
-        elif type == 69: return TagFileAttributes()
-        elif type == 70: return TagPlaceObject3()
-        elif type == 73: return TagDefineFontAlignZones()
-        elif type == 74: return TagCSMTextSettings()
-        elif type == 75: return TagDefineFont3()
-        elif type == 76: return TagSymbolClass()
-        elif type == 77: return TagMetadata()
-        elif type == 78: return TagDefineScalingGrid()
-        elif type == 82: return TagDoABC()
-        elif type == 83: return TagDefineShape4()
-        elif type == 84: return TagDefineMorphShape2()
-        elif type == 86: return TagDefineSceneAndFrameLabelData()
-        elif type == 87: return TagDefineBinaryData()
-        elif type == 88: return TagDefineFontName()
-        elif type == 89: return TagStartSound2()
-        else: return None
+        tag_class = cls.TAGS.get(type)
+        return None if tag_class is None else tag_class()
 
 class Tag(object):
     def __init__(self):
@@ -143,7 +125,154 @@ class DisplayListTag(Tag):
         s.add(self.characterId)
         return s
 
+class SWFTagIndex(object):
+    """
+    Compact index of the tag records in a timeline
+
+    Holds one entry per tag header: the tag type, the offset and length
+    of the tag body in the stream the tags were read from, and the
+    character ID for definition tags (-1 for all other tags).
+    The columns are kept in flat arrays instead of per tag objects.
+    frames holds the entry numbers of the ShowFrame tags, file_length
+    the (uncompressed) length of the stream.
+    """
+    def __init__(self):
+        self.types = array('H')
+        self.offsets = array('L')
+        self.lengths = array('L')
+        self.characterIds = array('l')
+        self.frames = array('L')
+        self.file_length = 0
+
+    def append(self, type, offset, length, characterId=-1):
+        """ Add an entry """
+        if type == TagShowFrame.TYPE:
+            self.frames.append(len(self.types))
+        self.types.append(type)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.characterIds.append(characterId)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, i):
+        """ Return the (type, offset, length, characterId) entry at i """
+        return (self.types[i], self.offsets[i], self.lengths[i], self.characterIds[i])
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self[i]
+
+def has_leading_character_id(tag_class):
+    """ Whether the tag body starts with the ID of the character it defines """
+    return issubclass(tag_class, DefinitionTag) and not issubclass(tag_class, TagJPEGTables)
+
+class TagTypeFilter(object):
+    """
+    Decides which tags get decoded while parsing a timeline.
+
+    include and exclude are collections of tag types (integers) or tag
+    classes, a class also matches its subclasses (TagDefineShape covers
+    DefineShape2-4). With include set only the matching tags are decoded;
+    exclude wins over include. TagEnd is always decoded, and DefineSprite
+    timelines are descended into unless they are excluded explicitly.
+    """
+    def __init__(self, include=None, exclude=None):
+        self.include = None if include is None else tuple(include)
+        self.exclude = tuple(exclude or ())
+        self._decisions = {}
+
+    def _matches(self, tag_type, tag_class, items):
+        for item in items:
+            if isinstance(item, type):
+                if issubclass(tag_class, item):
+                    return True
+            elif item == tag_type:
+                return True
+        return False
+
+    def __call__(self, tag_type):
+        """ Whether tags of tag_type should be decoded """
+        decision = self._decisions.get(tag_type)
+        if decision is None:
+            tag_class = TagFactory.tag_class(tag_type)
+            if tag_class is None or tag_class is TagEnd:
+                decision = True
+            elif self._matches(tag_type, tag_class, self.exclude):
+                decision = False
+            elif self.include is None:
+                decision = True
+            else:
+                decision = self._matches(tag_type, tag_class, self.include) or \
+                    issubclass(tag_class, SWFTimelineContainer)
+            self._decisions[tag_type] = decision
+        return decision
+
+# attributes a lazy tag answers without decoding its body
+_LAZY_PASSTHROUGH = frozenset(["__class__", "__dict__", "TYPE", "type"])
+_lazy_tag_classes = {}
+
+def _lazy_getattribute(self, name):
+    if name in _LAZY_PASSTHROUGH:
+        return object.__getattribute__(self, name)
+    if name == "characterId":
+        characterId = object.__getattribute__(self, "_lazy")[4]
+        if characterId is not None:
+            return characterId
+    decode_lazy_tag(self)
+    return getattr(self, name)
+
+def _lazy_setattr(self, name, value):
+    decode_lazy_tag(self)
+    setattr(self, name, value)
+
+def make_lazy_tag(tag, data, offset, length, version, characterId=None, observer=None):
+    """
+    Turn a freshly created tag into a lazy one that parses its body
+    (length bytes at offset in the stream data) on first attribute access.
+    The tag keeps passing isinstance() checks for its own class, and its
+    character ID (unless None) is answered without decoding the body.
+    The decoding is reported to the ParseObserver @observer, if any.
+    """
+    cls = type(tag)
+    lazy_cls = _lazy_tag_classes.get(cls)
+    if lazy_cls is None:
+        lazy_cls = type("Lazy" + cls.__name__, (cls,), {
+            "__doc__": cls.__doc__,
+            "__getattribute__": _lazy_getattribute,
+            "__setattr__": _lazy_setattr})
+        _lazy_tag_classes[cls] = lazy_cls
+    tag._lazy = (data, offset, length, version, characterId, observer)
+    tag.__class__ = lazy_cls
+    return tag
+
+def decode_lazy_tag(tag):
+    """ Parse the body of a lazy tag now (no-op for decoded tags) """
+    if "_lazy" not in object.__getattribute__(tag, "__dict__"):
+        return tag
+    cls = type(tag)
+    data, offset, length, version, characterId, observer = object.__getattribute__(tag, "_lazy")
+    object.__setattr__(tag, "__class__", cls.__bases__[0])
+    del tag._lazy
+    data.seek(offset)
+    _parse_tag_body(tag, data.readsubstream(length), length, version, observer)
+    return tag
+
+def _parse_tag_body(tag, content, length, version, observer=None):
+    """ Decode a tag body, reporting to the observer if there is one """
+    if observer is None:
+        tag.parse(content, length, version)
+        return
+    start = timer()
+    tag.parse(content, length, version)
+    observer.tag_parsed(tag, length, timer() - start, content.tell())
+
 class SWFTimelineContainer(DefinitionTag):
+    lazy = False
+    tag_index = None
+    tag_filter = None
+    observer = None
     def __init__(self):
         self.tags = []
         super(SWFTimelineContainer, self).__init__()
@@ -155,45 +284,179 @@ class SWFTimelineContainer(DefinitionTag):
             s.update(dt.get_dependencies())
         return s
 
-    def parse_tags(self, data, version=1):
+    def parse_tags(self, data, version=1, index=None, include=None, exclude=None):
+        """
+        Parse the tags of this timeline.
+        When self.lazy is set only the tag headers are read and indexed;
+        each tag body is decoded on first access.
+        When a SWFTagIndex of data is passed in, the tags are created
+        from it without reading the tag headers at all.
+        include / exclude restrict the tags that get decoded (see
+        TagTypeFilter), the other tags are skipped and kept as SWFRawTag.
+        """
+        if include is not None or exclude is not None:
+            self.tag_filter = TagTypeFilter(include, exclude)
+        if index is not None:
+            self.parse_tags_from_index(data, index)
+            return
         pos = data.tell()
         self.file_length = self._get_file_length(data, pos)
+        self.tag_index = SWFTagIndex()
+        self.tag_index.file_length = self.file_length
         tag = None
         while type(tag) != TagEnd:
             tag = self.parse_tag(data)
             if tag:
                 #print tag.name
                 self.tags.append(tag)
+        if self.file_length is None:
+            self.file_length = self.tag_index.file_length = data.tell()
+
+    def parse_tags_from_index(self, data, index):
+        """ Create the tags listed in a SWFTagIndex of data """
+        self.file_length = index.file_length
+        self.tag_index = index
+        for tag_type, offset, length, characterId in index:
+            tag_class = TagFactory.tag_class(tag_type)
+            if tag_class is None:
+                continue
+            if self.tag_filter is not None and not self.tag_filter(tag_type):
+                # the index doesn't keep the header size, the short form
+                # is used whenever the length fits
+                header_length = 2 if length < 0x3f else 6
+                tag = SWFRawTag()
+                tag.header = SWFRecordHeader(tag_type, length, header_length)
+                tag.pos_content = offset
+                self.tags.append(tag)
+                continue
+            tag = self._create_tag(tag_class)
+            if self.lazy and not isinstance(tag, TagEnd):
+                make_lazy_tag(tag, data, offset, length, tag.version,
+                    characterId if isinstance(tag, DefinitionTag) else None,
+                    self.observer)
+            else:
+                data.seek(offset)
+                self._parse_tag_body(tag, data.readsubstream(length), length)
+            self.tags.append(tag)
+        if not self.tags or type(self.tags[-1]) != TagEnd:
+            self.tags.append(TagEnd())
 
     def parse_tag(self, data):
         pos = data.tell()
-        eof = (pos > self.file_length)
+        eof = self._at_end(data, pos)
         if eof:
             #print "WARNING: end of file encountered, no end tag."
             return TagEnd()
         raw_tag = data.readraw_tag()
         tag_type = raw_tag.header.type
-        tag = TagFactory.create(tag_type)
-        if tag is not None:
-            #print tag.name
+        length = raw_tag.header.content_length
+        tag_class = TagFactory.tag_class(tag_type)
+        if tag_class is not None:
             data.seek(raw_tag.pos_content)
-            data.reset_bits_pending()
-            tag.parse(data, raw_tag.header.content_length, tag.version)
+            characterId = -1
+            if length >= 2 and has_leading_character_id(tag_class):
+                characterId = data.peekUI16()
+            if self.tag_index is not None:
+                self.tag_index.append(tag_type, raw_tag.pos_content, length, characterId)
+            if self.tag_filter is not None and not self.tag_filter(tag_type):
+                # not wanted, keep the header record only
+                data.skip_bytes(length)
+                return raw_tag
+            tag = self._create_tag(tag_class)
+            #print tag.name
+            if self.lazy and not isinstance(tag, TagEnd):
+                # only the header is read now, the body is decoded on demand
+                make_lazy_tag(tag, data, raw_tag.pos_content, length, tag.version,
+                    characterId if isinstance(tag, DefinitionTag) else None,
+                    self.observer)
+            else:
+                # decode the tag body from an in-memory buffer
+                content = data.readsubstream(length)
+                self._parse_tag_body(tag, content, length)
             #except:
             #    print "=> tag_error", tag.name
             data.seek(pos + raw_tag.header.tag_length)
         else:
             #print "[WARNING] unhandled tag %s" % (hex(tag_type))
+            if self.tag_index is not None:
+                self.tag_index.append(tag_type, raw_tag.pos_content, length)
             data.skip_bytes(raw_tag.header.tag_length)
+            tag = None
         data.seek(pos + raw_tag.header.tag_length)
         return tag
 
+    def iter_parse_tags(self, data, recurse=True):
+        """
+        Generator version of parse_tags.
+
+        Yields (tag, sprite, frame) for every tag of this timeline without
+        keeping them: sprite is the DefineSprite the tag belongs to (None
+        on the main timeline) and frame the 0-based frame number. With
+        recurse set the control tags of a sprite are yielded right after
+        it, and the sprite's own tags list stays empty.
+        """
+        self.file_length = self._get_file_length(data, data.tell())
+        self.tag_index = None
+        self.lazy = False
+        sprite = self if isinstance(self, TagDefineSprite) else None
+        frame = 0
+        tag = None
+        while type(tag) != TagEnd:
+            pos = data.tell()
+            if recurse and not self._at_end(data, pos) and \
+                    (data.peekUI16() >> 6) == TagDefineSprite.TYPE and \
+                    (self.tag_filter is None or self.tag_filter(TagDefineSprite.TYPE)):
+                raw_tag = data.readraw_tag()
+                data.seek(raw_tag.pos_content)
+                content = data.readsubstream(raw_tag.header.content_length)
+                tag = self._create_tag(TagDefineSprite)
+                tag.parse_header(content)
+                yield tag, sprite, frame
+                for item in tag.iter_parse_tags(content, recurse):
+                    yield item
+                data.seek(pos + raw_tag.header.tag_length)
+                continue
+            tag = self.parse_tag(data)
+            if tag is None:
+                continue
+            yield tag, sprite, frame
+            if isinstance(tag, TagShowFrame):
+                frame += 1
+
+    def _create_tag(self, tag_class):
+        """ Create a tag, nested timelines inherit the parse options """
+        tag = tag_class()
+        if isinstance(tag, SWFTimelineContainer):
+            if self.lazy:
+                tag.lazy = True
+            if self.tag_filter is not None:
+                tag.tag_filter = self.tag_filter
+            if self.observer is not None:
+                tag.observer = self.observer
+        return tag
+
+    def _parse_tag_body(self, tag, content, length):
+        """ Decode a tag body, reporting to the observer if there is one """
+        _parse_tag_body(tag, content, length, tag.version, self.observer)
+
     def _get_file_length(self, data, pos):
-        data.f.seek(0, 2)
+        """
+        Return the length of the tag data, or None for a compressed body:
+        the length in its header is only advisory (it's wrong often enough
+        in the wild), so tags are read until the inflated data runs out.
+        """
+        if isinstance(getattr(data, "f", None), SWFDecompressReader):
+            return None
+        data.seek(0, 2)
         length = data.tell()
-        data.f.seek(pos)
+        data.seek(pos)
         return length
 
+    def _at_end(self, data, pos):
+        if self.file_length is None:
+            return data.at_end()
+        return pos >= self.file_length
+
     def all_tags_of_type(self, type_or_types, recurse_into_sprites = True):
         """
         Generator for all tags of the given type_or_types.
@@ -501,9 +764,11 @@ class TagDefineBits(DefinitionTag):
     the JPEG SOI marker.
     """
     TYPE = 6
-    bitmapData = None
+    bitmapDataView = memoryview(b"")
+    bitmapData = payload_property("bitmapData", "Return the image data as a file object")
+    _image = None
+    _png = None
     def __init__(self):
-        self.bitmapData = BytesIO()
         self.bitmapType = BitmapType.JPEG
         super(TagDefineBits, self).__init__()
 
@@ -516,11 +781,41 @@ class TagDefineBits(DefinitionTag):
         return TagDefineBits.TYPE
 
     def parse(self, data, length, version=1):
-        self.bitmapData = BytesIO()
+        self.bitmapData = None
         self.characterId = data.readUI16()
         if length > 2:
-            self.bitmapData.write(data.f.read(length - 2))
-            self.bitmapData.seek(0)
+            self.bitmapDataView = data.readview(length - 2)
+
+    def get_image_data(self, jpeg_tables=None):
+        """
+        Return the image as a standalone JPEG (or PNG, GIF89a) file,
+        without decoding it. Erroneous JPEG headers are removed and
+        DefineBits data is merged with the encoding tables of the
+        JPEGTables tag (@jpeg_tables).
+        """
+        if self.bitmapType == BitmapType.JPEG:
+            jpeg = ImageUtils.fix_jpeg(self.bitmapDataView,
+                jpeg_tables if self.type == TagDefineBits.TYPE else None)
+            if jpeg is not None:
+                return jpeg
+        return bytes(self.bitmapDataView)
+
+    def get_image(self, jpeg_tables=None):
+        """
+        Return the bitmap as a PIL image (see get_image_data() for
+        @jpeg_tables), or the one kept by swf.bitmap.decode_bitmaps()
+        """
+        if self._image is not None:
+            return self._image
+        return Image.open(BytesIO(self.get_image_data(jpeg_tables)))
+
+    def get_png(self, jpeg_tables=None):
+        """ Return the bitmap encoded as PNG (see get_image()) """
+        if self._png is not None:
+            return self._png
+        f = BytesIO()
+        self.get_image(jpeg_tables).save(f, "PNG")
+        return f.getvalue()
 
 class TagJPEGTables(DefinitionTag):
     """
@@ -534,12 +829,12 @@ class TagJPEGTables(DefinitionTag):
     The minimum file format version for this tag is SWF 1.
     """
     TYPE = 8
-    jpegTables = None
+    jpegTablesView = memoryview(b"")
+    jpegTables = payload_property("jpegTables", "Return the encoding tables as a file object")
     length = 0
 
     def __init__(self):
         super(TagJPEGTables, self).__init__()
-        self.jpegTables = BytesIO()
 
     @property
     def name(self):
@@ -551,9 +846,9 @@ class TagJPEGTables(DefinitionTag):
 
     def parse(self, data, length, version=1):
         self.length = length
+        self.jpegTables = None
         if length > 0:
-            self.jpegTables.write(data.f.read(length))
-            self.jpegTables.seek(0)
+            self.jpegTablesView = data.readview(length)
 
     def __str__(self):
         s = super(TagJPEGTables, self).__str__()
@@ -828,92 +1123,175 @@ class TagDefineBitsLossless(DefinitionTag):
     The minimum file format version for this tag is SWF 2.
     """
     TYPE = 20
-    bitmapData = None
-    image_buffer = b""
     bitmap_format = 0
     bitmap_width = 0
     bitmap_height = 0
     bitmap_color_size = 0
     zlib_bitmap_data = None
     padded_width = 0
+    _image = None
+    _png = None
     def __init__(self):
         super(TagDefineBitsLossless, self).__init__()
 
     def parse(self, data, length, version=1):
-        import zlib
-        self.image_buffer = b""
+        self._bitmapData = None
+        self._bitmap_cache_key = None
         self.characterId = data.readUI16()
         self.bitmap_format = data.readUI8()
         self.bitmap_width = data.readUI16()
         self.bitmap_height = data.readUI16()
         if self.bitmap_format == BitmapFormat.BIT_8:
             self.bitmap_color_size = data.readUI8()
-            self.zlib_bitmap_data = data.f.read(length-8)
+            self.zlib_bitmap_data = data.readview(length-8)
+        elif self.bitmap_format in (BitmapFormat.BIT_15, BitmapFormat.BIT_24):
+            self.zlib_bitmap_data = data.readview(length-7)
         else:
-            self.zlib_bitmap_data = data.f.read(length-7)
-
-        # decompress zlib encoded bytes
-        compressed_length = len(self.zlib_bitmap_data)
-        zip = zlib.decompressobj()
-        temp = BytesIO()
-        temp.write(zip.decompress(self.zlib_bitmap_data))
-        temp.seek(0, 2)
-        uncompressed_length = temp.tell()
-        temp.seek(0)
+            raise Exception("unhandled bitmap format! %s %d" % (BitmapFormat.tobytes(self.bitmap_format), self.bitmap_format))
 
         # padding : should be aligned to 32 bit boundary
         self.padded_width = self.bitmap_width
         while self.padded_width % 4 != 0:
             self.padded_width += 1
-        t = self.padded_width * self.bitmap_height
+        # bitmapData holds a PNG
+        self.bitmapType = BitmapType.PNG
+
+    @property
+    def bitmapData(self):
+        """ Return the bitmap as a PNG file object (see get_png()) """
+        f = getattr(self, "_bitmapData", None)
+        if f is None:
+            f = self._bitmapData = BytesIO(self.get_png())
+        return f
+
+    @bitmapData.setter
+    def bitmapData(self, value):
+        self._bitmapData = value
+
+    @property
+    def image_buffer(self):
+        """
+        Return the decoded RGBA pixels, including the padding of
+        colormapped rows (see get_rgba() for the pixels without)
+        """
+        return self._decode()
 
+    def get_image(self):
+        """
+        Return the bitmap as an RGBA PIL image, or the one kept by
+        swf.bitmap.decode_bitmaps()
+        """
+        if self._image is not None:
+            return self._image
+        im = Image.frombytes("RGBA", (self._buffer_width(), self.bitmap_height), self._decode())
+        if self._buffer_width() != self.bitmap_width:
+            im = im.crop((0, 0, self.bitmap_width, self.bitmap_height))
+        return im
+
+    def get_rgba(self):
+        """ Return the RGBA pixels of the bitmap, bitmap_width pixels per row """
+        if self._buffer_width() == self.bitmap_width:
+            return self._decode()
+        return self.get_image().tobytes()
+
+    def get_png(self):
+        """ Return the bitmap encoded as PNG """
+        if self._png is not None:
+            return self._png
+        key = (self._cache_key(), "png")
+        png = _bitmap.cache.get(key)
+        if png is None:
+            f = BytesIO()
+            self.get_image().save(f, "PNG")
+            png = f.getvalue()
+            _bitmap.cache.put(key, png)
+        return png
+
+    def _cache_key(self):
+        """ Key of the decoded bitmap in swf.bitmap.cache: the tag type and the payload hash """
+        if getattr(self, "_bitmap_cache_key", None) is None:
+            import hashlib
+            self._bitmap_cache_key = (self.type, self.bitmap_format, self.bitmap_width,
+                self.bitmap_height, self.bitmap_color_size,
+                hashlib.sha1(self.zlib_bitmap_data).digest())
+        return self._bitmap_cache_key
+
+    def _buffer_width(self):
+        """ Width of the rows of the decoded buffer, in pixels """
+        if self.bitmap_format == BitmapFormat.BIT_8:
+            return self.padded_width
+        if self.bitmap_format == BitmapFormat.BIT_15:
+            return (self.bitmap_width + 1) & ~1
+        return self.bitmap_width
+
+    def _decode(self):
+        """ Return the RGBA buffer (decoded, or from the cache) """
+        key = (self._cache_key(), "rgba")
+        image_buffer = _bitmap.cache.get(key)
+        if image_buffer is None:
+            image_buffer = self._decode_pixels()
+            _bitmap.cache.put(key, image_buffer)
+        return image_buffer
+
+    def _decode_pixels(self):
+        """ Inflate the payload and convert it to an RGBA buffer """
+        import zlib
+        # decompress zlib encoded bytes
+        pixels = zlib.decompressobj().decompress(self.zlib_bitmap_data)
+        t = self.padded_width * self.bitmap_height
         is_lossless2 = (type(self) == TagDefineBitsLossless2)
-        im = None
-        self.bitmapData = BytesIO()
 
-        indexed_colors = []
         if self.bitmap_format == BitmapFormat.BIT_8:
-            for i in range(0, self.bitmap_color_size + 1):
-                r = ord(temp.read(1))
-                g = ord(temp.read(1))
-                b = ord(temp.read(1))
-                a = ord(temp.read(1)) if is_lossless2 else 0xff
-                indexed_colors.append(struct.pack("BBBB", r, g, b, a))
-
-            # create the image buffer
-            s = BytesIO()
-            for i in range(t):
-                s.write(indexed_colors[ord(temp.read(1))])
-            self.image_buffer = s.getvalue()
-            s.close()
-
-            im = Image.frombytes("RGBA", (self.padded_width, self.bitmap_height), self.image_buffer)
-            im = im.crop((0, 0, self.bitmap_width, self.bitmap_height))
+            # color table: RGB or RGBA entries, alpha 0xff for RGB
+            entry_size = 4 if is_lossless2 else 3
+            table_size = (self.bitmap_color_size + 1) * entry_size
+            color_table = pixels[:table_size]
+            if len(color_table) < table_size:
+                raise EOFError
+            indices = pixels[table_size:table_size + t]
+            if len(indices) < t:
+                raise EOFError
+            if indices.translate(None, bytes(bytearray(range(0, self.bitmap_color_size + 1)))):
+                raise IndexError("DefineBitsLossless: color index out of range")
+
+            # look up each channel with a translation table and interleave
+            # them into the image buffer
+            image_buffer = bytearray(4 * t)
+            for channel in range(0, 4):
+                if channel == 3 and not is_lossless2:
+                    image_buffer[3::4] = b"\xff" * t
+                    continue
+                lookup = bytearray(256)
+                lookup[:self.bitmap_color_size + 1] = color_table[channel::entry_size]
+                image_buffer[channel::4] = indices.translate(bytes(lookup))
+            return bytes(image_buffer)
 
         elif self.bitmap_format == BitmapFormat.BIT_15:
-            raise Exception("DefineBitsLossless: BIT_15 not yet implemented")
-        elif self.bitmap_format == BitmapFormat.BIT_24:
+            # rows of big endian PIX15s (0RRRRRGGGGGBBBBB), padded to 32 bits
+            row_width = self._buffer_width()
+            size = row_width * self.bitmap_height * 2
+            if len(pixels) < size:
+                raise EOFError
+            # PIL unpacks little endian 15 bit RGB as "BGR;15"
+            swapped = bytearray(size)
+            swapped[0::2] = pixels[1:size:2]
+            swapped[1::2] = pixels[0:size:2]
+            im = Image.frombytes("RGB", (row_width, self.bitmap_height), bytes(swapped), "raw", "BGR;15")
+            return im.convert("RGBA").tobytes()
+
+        else:
             # we have no padding, since PIX24s are 32-bit aligned
             t = self.bitmap_width * self.bitmap_height
-            # read PIX24's
-            s = BytesIO()
-            for i in range(0, t):
-                if not is_lossless2:
-                    temp.read(1) # reserved, always 0
-                a = ord(temp.read(1)) if is_lossless2 else 0xff
-                r = ord(temp.read(1))
-                g = ord(temp.read(1))
-                b = ord(temp.read(1))
-                s.write(struct.pack("BBBB", r, g, b, a))
-            self.image_buffer = s.getvalue()
-            im = Image.frombytes("RGBA", (self.bitmap_width, self.bitmap_height), self.image_buffer)
-        else:
-            raise Exception("unhandled bitmap format! %s %d" % (BitmapFormat.tobytes(self.bitmap_format), self.bitmap_format))
-
-        if not im is None:
-            im.save(self.bitmapData, "PNG")
-            self.bitmapData.seek(0)
-            self.bitmapType = ImageUtils.get_image_type(self.bitmapData)
+            # PIX24s (reserved, R, G, B) or ARGB, swizzled into RGBA
+            argb = pixels[:4 * t]
+            if len(argb) < 4 * t:
+                raise EOFError
+            image_buffer = bytearray(4 * t)
+            image_buffer[0::4] = argb[1::4]
+            image_buffer[1::4] = argb[2::4]
+            image_buffer[2::4] = argb[3::4]
+            image_buffer[3::4] = argb[0::4] if is_lossless2 else b"\xff" * t
+            return bytes(image_buffer)
 
     @property
     def name(self):
@@ -968,7 +1346,7 @@ class TagDefineBitsJPEG2(TagDefineBits):
 
     def parse(self, data, length, version=1):
         super(TagDefineBitsJPEG2, self).parse(data, length, version)
-        self.bitmapType = ImageUtils.get_image_type(self.bitmapData)
+        self.bitmapType = ImageUtils.get_image_type(self.bitmapDataView)
 
 class TagDefineShape2(TagDefineShape):
     """
@@ -1213,8 +1591,8 @@ class TagDefineBitsJPEG3(TagDefineBitsJPEG2):
     format version for embedding PNG of GIF89a data is SWF 8.
     """
     TYPE = 35
+    bitmapAlphaDataView = memoryview(b"")
     def __init__(self):
-        self.bitmapAlphaData = BytesIO()
         super(TagDefineBitsJPEG3, self).__init__()
 
     @property
@@ -1233,25 +1611,53 @@ class TagDefineBitsJPEG3(TagDefineBitsJPEG2):
     def level(self):
         return 3
 
+    @property
+    def bitmapAlphaData(self):
+        """
+        Return the alpha plane (one byte per pixel) as a file object.
+        It is inflated the first time it is asked for.
+        """
+        f = getattr(self, "_bitmapAlphaData", None)
+        if f is None:
+            import zlib
+            # decompress zlib encoded bytes
+            f = BytesIO(zlib.decompressobj().decompress(self.bitmapAlphaDataView)
+                        if len(self.bitmapAlphaDataView) > 0 else b"")
+            self._bitmapAlphaData = f
+        return f
+
+    @bitmapAlphaData.setter
+    def bitmapAlphaData(self, value):
+        self._bitmapAlphaData = value
+
+    def get_image(self, jpeg_tables=None):
+        """
+        Return the bitmap as a PIL image, with the alpha plane applied
+        (RGBA). The color values of the JPEG data are premultiplied by
+        alpha, this is undone. Without alpha plane (or if its size doesn't
+        match the image) the decoded image is returned as it is.
+        """
+        if self._image is not None:
+            return self._image
+        image = Image.open(BytesIO(self.get_image_data()))
+        if len(self.bitmapAlphaDataView) == 0:
+            return image
+        alpha = self.bitmapAlphaData.getvalue()
+        if len(alpha) != image.size[0] * image.size[1]:
+            return image
+        r, g, b = image.convert("RGB").split()
+        a = Image.frombuffer("L", image.size, alpha, "raw", "L", 0, 1)
+        return Image.merge("RGBa", (r, g, b, a)).convert("RGBA")
+
     def parse(self, data, length, version=1):
-        import zlib
         self.characterId = data.readUI16()
         alphaOffset = data.readUI32()
-        self.bitmapAlphaData = BytesIO()
-        self.bitmapData = BytesIO()
-        self.bitmapData.write(data.f.read(alphaOffset))
-        self.bitmapData.seek(0)
-        self.bitmapType = ImageUtils.get_image_type(self.bitmapData)
+        self.bitmapAlphaData = None
+        self.bitmapData = None
+        self.bitmapDataView = data.readview(alphaOffset)
+        self.bitmapType = ImageUtils.get_image_type(self.bitmapDataView)
         alphaDataSize = length - alphaOffset - 6
-        if alphaDataSize > 0:
-            self.bitmapAlphaData.write(data.f.read(alphaDataSize))
-            self.bitmapAlphaData.seek(0)
-            # decompress zlib encoded bytes
-            zip = zlib.decompressobj()
-            temp = BytesIO()
-            temp.write(zip.decompress(self.bitmapAlphaData.read()))
-            temp.seek(0)
-            self.bitmapAlphaData = temp
+        self.bitmapAlphaDataView = data.readview(alphaDataSize) if alphaDataSize > 0 else memoryview(b"")
 
 class TagDefineBitsLossless2(TagDefineBitsLossless):
     """
@@ -1301,9 +1707,13 @@ class TagDefineSprite(SWFTimelineContainer):
         super(TagDefineSprite, self).__init__()
 
     def parse(self, data, length, version=1):
+        self.parse_header(data)
+        self.parse_tags(data, version)
+
+    def parse_header(self, data):
+        """ Parse the sprite ID and frame count that precede the control tags """
         self.characterId = data.readUI16()
         self.frameCount = data.readUI16()
-        self.parse_tags(data, version)
 
     def get_dependencies(self):
         s = super(TagDefineSprite, self).get_dependencies()
@@ -1459,7 +1869,7 @@ class TagDefineFont2(TagDefineFont):
 
         fontNameLen = data.readUI8()
         fontNameRaw = BytesIO()
-        fontNameRaw.write(data.f.read(fontNameLen))
+        fontNameRaw.write(data.read(fontNameLen))
         fontNameRaw.seek(0)
         self.fontName = fontNameRaw.read()
 
@@ -1468,16 +1878,16 @@ class TagDefineFont2(TagDefineFont):
         # don't # Skip offsets. We don't need them.
         # Adobe Flash Player works in this way
 
-        startOfOffsetTable = data.f.tell()
+        startOfOffsetTable = data.tell()
         offsetTable = []
         for i in range(0, numGlyphs):
             offsetTable.append(data.readUI32() if self.wideOffsets else data.readUI16())
 
         codeTableOffset = data.readUI32() if self.wideOffsets else data.readUI16()
         for i in range(0, numGlyphs):
-            data.f.seek(startOfOffsetTable + offsetTable[i])
+            data.seek(startOfOffsetTable + offsetTable[i])
             self.glyphShapeTable.append(data.readSHAPE(self.unitDivisor))
-        data.f.seek(startOfOffsetTable + codeTableOffset)
+        data.seek(startOfOffsetTable + codeTableOffset)
         for i in range(0, numGlyphs):
             self.codeTable.append(data.readUI16() if self.wideCodes else data.readUI8())
 
@@ -1770,7 +2180,7 @@ class TagDoABC(Tag):
         flags = data.readUI32()
         self.lazyInitializeFlag = ((flags & 0x01) != 0)
         self.abcName = data.readString()
-        self.bytes = data.f.read(length - (data.tell() - pos))
+        self.bytes = data.read(length - (data.tell() - pos))
 
 class TagDefineShape4(TagDefineShape3):
     TYPE = 83
@@ -1900,6 +2310,8 @@ class TagDefineFontName(Tag):
 
 class TagDefineSound(Tag):
     TYPE = 14
+    soundDataView = memoryview(b"")
+    soundData = payload_property("soundData", "Return the sound data as a file object")
     def __init__(self):
         super(TagDefineSound, self).__init__()
 
@@ -1928,7 +2340,8 @@ class TagDefineSound(Tag):
         self.soundChannels = data.readUB(1)
         self.soundSamples = data.readUI32()
         # used 2 + 1 + 4 bytes here
-        self.soundData = BytesIO(data.read(length - 7))
+        self.soundData = None
+        self.soundDataView = data.readview(length - 7)
 
     def __str__(self):
         s = super(TagDefineSound, self).__str__()
@@ -2574,6 +2987,8 @@ class TagVideoFrame(Tag):
     with DefineVideoStream.
     """
     TYPE = 61
+    videoDataView = memoryview(b"")
+    videoData = payload_property("videoData", "Return the video data as bytes", memoryview.tobytes)
 
     def __init__(self):
         super(TagVideoFrame, self).__init__()
@@ -2589,7 +3004,8 @@ class TagVideoFrame(Tag):
     def parse(self, data, length, version=1):
         self.streamId = data.readUI16()
         self.frameNumber = data.readUI16()
-        self.videoData = data.read(length - 4)
+        self.videoData = None
+        self.videoDataView = data.readview(length - 4)
 
 class TagDefineMorphShape2(TagDefineMorphShape):
     """
@@ -2639,6 +3055,69 @@ class TagDefineMorphShape2(TagDefineMorphShape):
         self.startEdges = data.readSHAPE();
         self.endEdges = data.readSHAPE();
 
+for _tag_class in (
+    TagEnd,
+    TagShowFrame,
+    TagDefineShape,
+    TagPlaceObject,
+    TagRemoveObject,
+    TagDefineBits,
+    TagDefineButton,
+    TagJPEGTables,
+    TagSetBackgroundColor,
+    TagDefineFont,
+    TagDefineText,
+    TagDoAction,
+    TagDefineFontInfo,
+    TagDefineSound,
+    TagStartSound,
+    TagDefineButtonSound,
+    TagSoundStreamHead,
+    TagSoundStreamBlock,
+    TagDefineBitsLossless,
+    TagDefineBitsJPEG2,
+    TagDefineShape2,
+    TagProtect,
+    TagPlaceObject2,
+    TagRemoveObject2,
+    TagDefineShape3,
+    TagDefineText2,
+    TagDefineButton2,
+    TagDefineBitsJPEG3,
+    TagDefineBitsLossless2,
+    TagDefineEditText,
+    TagDefineSprite,
+    TagProductInfo,
+    TagFrameLabel,
+    TagSoundStreamHead2,
+    TagDefineMorphShape,
+    TagDefineFont2,
+    TagExportAssets,
+    TagEnableDebugger,
+    TagDoInitAction,
+    TagDefineVideoStream,
+    TagVideoFrame,
+    TagDebugID,
+    TagEnableDebugger2,
+    TagScriptLimits,
+    TagFileAttributes,
+    TagPlaceObject3,
+    TagDefineFontAlignZones,
+    TagCSMTextSettings,
+    TagDefineFont3,
+    TagSymbolClass,
+    TagMetadata,
+    TagDefineScalingGrid,
+    TagDoABC,
+    TagDefineShape4,
+    TagDefineMorphShape2,
+    TagDefineSceneAndFrameLabelData,
+    TagDefineBinaryData,
+    TagDefineFontName,
+    TagStartSound2,
+):
+    TagFactory.register(_tag_class)
+
 if __name__ == '__main__':
     # some table checks
     for x in range(256):
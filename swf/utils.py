@@ -32,25 +32,70 @@ class ImageUtils(object):
         
     @classmethod
     def get_image_type(cls, data):
-        pos = data.tell()
+        """ Sniff the image type of a file object or bytes-like object """
+        if not hasattr(data, 'tell'):
+            header = bytearray(data[:8]) if len(data) > 8 else None
+        else:
+            pos = data.tell()
+            data.seek(0, 2) # moves file pointer to final position
+            header = None
+            if data.tell() > 8:
+                data.seek(0)
+                header = bytearray(data.read(8))
+            data.seek(pos)
         image_type = 0
-        data.seek(0, 2) # moves file pointer to final position
-        if data.tell() > 8:
-            data.seek(0)
-            b0 = ord(data.read(1))
-            b1 = ord(data.read(1))
-            b2 = ord(data.read(1))
-            b3 = ord(data.read(1))
-            b4 = ord(data.read(1))
-            b5 = ord(data.read(1))
-            b6 = ord(data.read(1))
-            b7 = ord(data.read(1))
-            if b0 == 0xff and (b1 == 0xd8 or 1 == 0xd9):
+        if header is not None:
+            b0, b1, b2, b3, b4, b5, b6, b7 = header
+            if b0 == 0xff and (b1 == 0xd8 or b1 == 0xd9):
                 image_type = BitmapType.JPEG
             elif b0 == 0x89 and b1 == 0x50 and b2 == 0x4e and b3 == 0x47 and \
                 b4 == 0x0d and b5 == 0x0a and b6 == 0x1a and b7 == 0x0a:
                 image_type = BitmapType.PNG
             elif b0 == 0x47 and b1 == 0x49 and b2 == 0x46 and b3 == 0x38 and b4 == 0x39 and b5 == 0x61:
                 image_type = BitmapType.GIF89A
-        data.seek(pos)
-        return image_type
\ No newline at end of file
+        return image_type
+
+    @classmethod
+    def fix_jpeg(cls, data, tables=None):
+        """
+        Return SWF JPEG data as a standalone JPEG file, without decoding it.
+
+        SWF JPEG data may start with an erroneous EOI+SOI (0xFF, 0xD9, 0xFF,
+        0xD8) before the SOI, and DefineBits data needs the encoding tables
+        of the JPEGTables tag. The marker segments of @tables (if any) and
+        @data are copied behind a single SOI, dropping all SOI and EOI
+        markers before the scan data. Returns None if the data isn't made
+        of JPEG marker segments.
+        """
+        out = bytearray(b"\xff\xd8")
+        for part in (tables, data):
+            if part is None:
+                continue
+            part = bytearray(part)
+            pos = 0
+            end = len(part)
+            while pos + 1 < end:
+                if part[pos] != 0xff:
+                    return None
+                marker = part[pos + 1]
+                if marker == 0xff:
+                    # fill byte
+                    pos += 1
+                elif marker == 0xd8 or marker == 0xd9:
+                    # SOI, EOI
+                    pos += 2
+                elif marker == 0xda:
+                    # start of scan: the rest is image data
+                    out += part[pos:]
+                    return bytes(out)
+                elif marker == 0x01 or 0xd0 <= marker <= 0xd7:
+                    # markers without a length
+                    out += part[pos:pos + 2]
+                    pos += 2
+                else:
+                    if pos + 4 > end:
+                        return None
+                    length = part[pos + 2] << 8 | part[pos + 3]
+                    out += part[pos:pos + 2 + length]
+                    pos += 2 + length
+        return None
@@ -8,3 +8,766 @@ def test_header():
     swf = SWF(f)
 
     assert swf.header.frame_count == 1
+
+def test_buffer_stream():
+
+    from io import BytesIO
+    from swf.stream import SWFStream, SWFBufferStream
+
+    data = bytes(bytearray([0xb5, 0x3c, 0xff, 0x01, 0x80, 0x7e, 0x41, 0x42, 0x00, 0x12, 0x34]))
+    f = SWFStream(BytesIO(data))
+    b = SWFBufferStream(data)
+
+    for s in (f, b):
+        assert s.readUB(3) == 5
+        assert s.readSB(7) == -44
+        assert s.readUB(6) == 0x3c
+        assert s.peekUI8() == 0xff
+        assert s.readSI8() == -1
+        assert s.readUI16() == 0x8001
+        assert s.readSB(7) == 0x3f
+        s.reset_bits_pending()
+        assert s.readString() == "AB"
+        assert s.tell() == 9
+        assert s.readUI16() == 0x3412
+
+def test_mmap_fws():
+
+    import os
+    import struct
+    import tempfile
+    from swf.tag import TagDefineBits, TagEnd
+
+    # FWS header, empty 5-bit RECT, 24fps, 1 frame, DefineBits, End
+    jpeg = b"\xff\xd8" + b"\x00" * 16 + b"\xff\xd9"
+    body = b"\x00" + struct.pack("<HH", 24 << 8, 1)
+    body += struct.pack("<HI", (6 << 6) | 0x3f, len(jpeg) + 2) + struct.pack("<H", 1) + jpeg
+    body += struct.pack("<H", 0)
+    data = b"FWS\x0a" + struct.pack("<I", len(body) + 8) + body
+
+    fd, path = tempfile.mkstemp(suffix=".swf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        swf = SWF()
+        swf.parse_file(path, use_mmap=True)
+        assert swf.header.frame_count == 1
+        assert isinstance(swf.tags[-1], TagEnd)
+        tag = swf.tags[0]
+        assert isinstance(tag, TagDefineBits)
+        assert isinstance(tag.bitmapDataView, memoryview)
+        assert tag.bitmapData.read() == jpeg
+        del tag, swf
+    finally:
+        os.remove(path)
+
+def test_decompress_reader():
+
+    import random
+    import zlib
+    from io import BytesIO
+    from swf.stream import SWFDecompressReader
+
+    rnd = random.Random(1)
+    data = bytes(bytearray(rnd.getrandbits(8) for i in range(1 << 20)))
+    source = BytesIO(zlib.compress(data))
+    r = SWFDecompressReader(source, zlib.decompressobj(), len(data))
+
+    assert r.read(4) == data[:4]
+    assert source.tell() < len(source.getvalue())
+    assert r.seek(0, 2) == len(data)
+    r.seek(500000)
+    assert r.read(100) == data[500000:500100]
+    r.seek(499990)
+    assert r.read(10) == data[499990:500000]
+    assert r.read() == data[500000:]
+
+def test_wrong_header_length():
+
+    import struct
+    from io import BytesIO
+    from swf.generator import generate
+    from swf.movie import probe
+
+    for kind in ("CWS", "ZWS"):
+        data = generate(kind, shapes=2, edges=20, bitmaps=1, sprites=2, frames=2)
+        length = struct.unpack("<I", data[4:8])[0]
+        swf = SWF(BytesIO(data))
+        types = [t.type for t in swf.tags]
+        assert swf.file_length == length - 8
+        for wrong in (length // 2, length * 2, 0):
+            bad = data[:4] + struct.pack("<I", wrong) + data[8:]
+            for lazy in (False, True):
+                other = SWF(BytesIO(bad), lazy=lazy)
+                assert [t.type for t in other.tags] == types
+                assert other.file_length == length - 8
+            items = list(SWF.iter_tags(BytesIO(bad), recurse=False))
+            assert [t.type for t, sprite, frame in items] == types
+            assert probe(BytesIO(bad), tags=True).file_attributes.useNetwork
+
+def test_lazy_tags():
+
+    from swf.tag import TagDefineShape, TagPlaceObject2
+
+    swf = SWF(open('./test/data/test.swf', 'rb'), lazy=True)
+    eager = SWF(open('./test/data/test.swf', 'rb'))
+
+    assert [t.type for t in swf.tags] == [t.type for t in eager.tags]
+    assert list(swf.tag_index) == list(eager.tag_index)
+    assert sorted(swf.build_dictionary()) == [1]
+
+    shape = list(swf.all_tags_of_type(TagDefineShape))[0]
+    assert type(shape) is not TagDefineShape
+    assert shape.characterId == 1
+    assert type(shape) is not TagDefineShape
+    assert shape.shape_bounds.xmax == eager.tags[4].shape_bounds.xmax
+    assert type(shape) is TagDefineShape
+
+    place = list(swf.all_tags_of_type(TagPlaceObject2))[0]
+    assert place.characterId == 1
+
+def test_tag_index_cache():
+
+    import os
+    import shutil
+    import tempfile
+    from swf.cache import cache_path, load_tag_index
+
+    d = tempfile.mkdtemp()
+    try:
+        path = os.path.join(d, 'test.swf')
+        shutil.copy('./test/data/test.swf', path)
+        assert load_tag_index(path) is None
+
+        swf = SWF(index_cache=True)
+        swf.parse_file(path)
+        assert os.path.exists(cache_path(path))
+
+        index = load_tag_index(path)
+        assert list(index) == list(swf.tag_index)
+        assert list(index.frames) == [6]
+
+        cached = SWF(lazy=True, index_cache=True)
+        cached.parse_file(path)
+        assert cached.tag_index is not swf.tag_index
+        assert [t.name for t in cached.tags] == [t.name for t in swf.tags]
+        assert cached.tags[4].shape_bounds.xmax == swf.tags[4].shape_bounds.xmax
+
+        # a cache directory shares the entry between copies of a file
+        from swf import cache
+        cache_dir = os.path.join(d, 'cache')
+        SWF(index_cache=cache_dir).parse_file(path)
+        copy = os.path.join(d, 'copy.swf')
+        shutil.copy(path, copy)
+        assert list(load_tag_index(copy, cache_dir)) == list(index)
+        moved = os.path.join(d, 'moved.swf')
+        os.rename(path, moved)
+        assert list(load_tag_index(moved, cache_dir)) == list(index)
+        assert len([f for f in os.listdir(cache_dir) if f.endswith('.swfidx')]) == 1
+        # rewriting an entry replaces it without leaving the temp file
+        entries = sorted(os.listdir(cache_dir))
+        entry = os.path.join(cache_dir, [f for f in entries if f.endswith('.swfidx')][0])
+        with open(entry, 'rb') as f:
+            cache._write(entry, f.read())
+        assert sorted(os.listdir(cache_dir)) == entries
+        assert list(load_tag_index(moved, cache_dir)) == list(index)
+        # known files aren't hashed again
+        file_digest = cache.file_digest
+        cache.file_digest = None
+        try:
+            assert list(load_tag_index(moved, cache_dir)) == list(index)
+        finally:
+            cache.file_digest = file_digest
+    finally:
+        shutil.rmtree(d)
+
+def test_tag_filter():
+
+    from swf.data import SWFRawTag
+    from swf.tag import TagDefineShape, TagPlaceObject2, TagSetBackgroundColor
+
+    swf = SWF(open('./test/data/test.swf', 'rb'),
+              include=[TagPlaceObject2, TagSetBackgroundColor.TYPE])
+    skipped = [isinstance(t, SWFRawTag) for t in swf.tags]
+    assert skipped == [True, True, False, True, True, False, True, False]
+    assert swf.tags[4].header.type == TagDefineShape.TYPE
+    assert swf.tags[5].characterId == 1
+
+    swf = SWF(open('./test/data/test.swf', 'rb'), exclude=[TagDefineShape])
+    assert [t.header.type for t in swf.tags if isinstance(t, SWFRawTag)] == [2]
+
+def test_iter_tags():
+
+    from swf.tag import TagEnd, TagShowFrame
+
+    items = list(SWF.iter_tags('./test/data/test.swf'))
+    swf = SWF(open('./test/data/test.swf', 'rb'))
+
+    assert [type(t) for t, sprite, frame in items] == [type(t) for t in swf.tags]
+    assert all(sprite is None for t, sprite, frame in items)
+    assert [frame for t, sprite, frame in items] == [0] * 7 + [1]
+    assert isinstance(items[-2][0], TagShowFrame)
+    assert isinstance(items[-1][0], TagEnd)
+
+def test_probe():
+
+    from swf.movie import probe
+
+    info = probe('./test/data/test.swf')
+    assert info.header.compressed_lzma
+    assert info.header.frame_count == 1
+    assert info.header.frame_size.xmax == 11000
+    assert info.metadata is None
+
+    info = probe('./test/data/test.swf', tags=True)
+    assert info.file_attributes.hasMetadata
+    assert info.background_color & 0xffffff == 0xffffff
+    assert info.metadata.startswith('<rdf:RDF')
+
+def test_parse_profiler():
+
+    from swf.instrument import ParseObserver, ParseProfiler
+
+    class Recorder(ParseObserver):
+        def __init__(self):
+            self.events = []
+        def tag_parsed(self, tag, payload_bytes, seconds, bytes_read):
+            self.events.append((tag.name, payload_bytes, bytes_read))
+
+    recorder = Recorder()
+    profiler = ParseProfiler(forward=recorder)
+    swf = SWF(open('./test/data/test.swf', 'rb'), observer=profiler)
+
+    assert [e[0] for e in recorder.events] == [t.name for t in swf.tags]
+    assert ('DefineShape', 56, 56) in recorder.events
+    stats = profiler.stats[2]
+    assert stats.count == 1 and stats.payload_bytes == 56
+    assert sum(s["count"] for s in profiler.as_dict()) == len(swf.tags)
+
+def test_lazy_parse_profiler():
+    from swf.instrument import ParseProfiler
+    from swf.tag import TagDefineShape
+
+    profiler = ParseProfiler()
+    swf = SWF(open('./test/data/test.swf', 'rb'), lazy=True, observer=profiler)
+    # only the End tag is decoded while parsing
+    assert sum(s.count for s in profiler.report()) == 1
+    shape = list(swf.all_tags_of_type(TagDefineShape))[0]
+    assert shape.shapes is not None
+    stats = profiler.stats[2]
+    assert stats.count == 1 and stats.payload_bytes == 56 and stats.bytes_read == 56
+    for tag in swf.tags:
+        tag.name
+    assert sum(s.count for s in profiler.report()) == len(swf.tags)
+
+def test_generator():
+
+    from io import BytesIO
+    from swf.generator import generate, SWFWriter
+    from swf.tag import TagDefineShape, TagDefineFont2, TagDefineText, \
+        TagDefineBitsLossless, TagDefineSprite, TagSoundStreamBlock, TagVideoFrame
+
+    w = SWFWriter()
+    assert [w.calc_max_bits(True, [v]) for v in (0, 1, -1, 3, -4, 255, -256)] == [0, 2, 1, 3, 3, 9, 9]
+    assert [w.calc_max_bits(False, [v]) for v in (0, 1, 2, 255)] == [0, 1, 2, 8]
+
+    counts = dict(shapes=3, edges=40, fonts=1, glyphs=30, texts=2, bitmaps=2,
+                  bitmap_size=17, sprites=4, sound_blocks=5, video_frames=3, frames=2)
+    for kind in ("FWS", "CWS", "ZWS"):
+        swf = SWF(BytesIO(generate(kind, **counts)))
+        assert swf.header.frame_count == 5
+        assert len(list(swf.all_tags_of_type(TagDefineShape))) == 3
+        assert len(list(swf.all_tags_of_type(TagDefineFont2))[0].glyphShapeTable) == 30
+        assert len(list(swf.all_tags_of_type(TagDefineText))) == 2
+        assert [t.bitmap_width for t in swf.all_tags_of_type(TagDefineBitsLossless)] == [17, 17]
+        assert len(list(swf.all_tags_of_type(TagDefineSprite))) == 4
+        assert len(list(swf.all_tags_of_type(TagSoundStreamBlock))) == 5
+        assert len(list(swf.all_tags_of_type(TagVideoFrame))) == 3
+    assert generate("CWS", seed=1) == generate("CWS", seed=1)
+
+    attributes = swf.tags[0]
+    assert attributes.useNetwork and not attributes.actionscript3
+
+    frame = list(swf.all_tags_of_type(TagVideoFrame))[0]
+    assert isinstance(frame.videoDataView, memoryview)
+    assert isinstance(frame.videoData, bytes) and len(frame.videoData) == 32
+
+def test_clean_edge_map():
+
+    from swf.data import SWFShape, SWFStraightEdge, SWFCurvedEdge
+
+    a = SWFStraightEdge([0, 0], [20, 0], 0, 1)
+    b = SWFStraightEdge([100, 100], [120, 120], 0, 1)
+    c = SWFCurvedEdge([20, 0], [30, 10], [40, 0], 0, 1)
+    d = SWFStraightEdge([40, 0], [0, 0], 0, 1)
+    e = SWFStraightEdge([120, 120], [100, 100], 0, 1)
+    edge_map = {1: [a, b, c, d, e], 2: [e]}
+    SWFShape()._clean_edge_map(edge_map)
+    assert edge_map[1] == [a, c, d, b, e]
+    assert edge_map[2] == [e]
+
+def test_twips_shape_export():
+
+    from swf.export import DefaultShapeExporter
+    from swf.tag import TagDefineShape
+
+    class Recorder(DefaultShapeExporter):
+        def __init__(self, twips):
+            super(Recorder, self).__init__()
+            self.twips = twips
+            self.points = []
+        def move_to(self, x, y):
+            self.points.append((x, y))
+        def line_to(self, x, y):
+            self.points.append((x, y))
+        def curve_to(self, cx, cy, ax, ay):
+            self.points.append((ax, ay))
+
+    swf = SWF(open('./test/data/test.swf', 'rb'))
+    shape = list(swf.all_tags_of_type(TagDefineShape))[0].shapes
+    twips, pixels = Recorder(True), Recorder(False)
+    shape.export(twips)
+    shape.export(pixels)
+    assert twips.unit_divisor == 20
+    assert all(type(v) is int for p in twips.points for v in p)
+    assert [(x * (1 / 20.0), y * (1 / 20.0)) for x, y in twips.points] == pixels.points
+
+def test_compact_shapes():
+
+    from io import BytesIO
+    from swf.data import SWFShapeRecordTable
+    from swf.export import SVGExporter
+    from swf.generator import generate
+    from swf.tag import TagDefineShape
+
+    data = generate("FWS", shapes=2, edges=500, bitmaps=1)
+    swf = SWF(BytesIO(data))
+    compact = SWF(BytesIO(data), compact_shapes=True)
+    for a, b in zip(swf.all_tags_of_type(TagDefineShape), compact.all_tags_of_type(TagDefineShape)):
+        assert isinstance(b.shapes.records, SWFShapeRecordTable)
+        assert len(a.shapes.records) == len(b.shapes.records)
+        assert [repr(r) for r in a.shapes.records] == [repr(r) for r in b.shapes.records]
+        assert b.shapes.records.nbytes < 30 * len(b.shapes.records)
+    assert SVGExporter().export(swf).read() == SVGExporter().export(compact).read()
+
+    swf = SWF(open('./test/data/test.swf', 'rb'), compact_shapes=True)
+    records = list(swf.all_tags_of_type(TagDefineShape))[0].shapes.records
+    assert isinstance(records, SWFShapeRecordTable)
+    assert records.as_numpy()["types"].tolist() == list(records.types)
+
+def test_compact_edge_maps():
+
+    import random
+    from swf.data import SWFShape, SWFShapeRecordTable
+    from swf.generator import SWFWriter
+    from swf.stream import SWFBufferStream
+
+    def edge_maps(shape):
+        shape._create_edge_maps()
+        return [[(k, [repr(e) for e in v]) for k, v in m.items()]
+                for m in shape.fill_edge_maps + shape.line_edge_maps]
+
+    w = SWFWriter()
+    w.writeSHAPERECORDS(random.Random(1), 300)
+    shapes = []
+    for compact in (False, True):
+        stream = SWFBufferStream(w.getvalue())
+        stream.compact_shapes = compact
+        shapes.append(SWFShape(stream))
+    expected = edge_maps(shapes[0])
+    assert len(expected) > 0
+    assert edge_maps(shapes[1]) == expected
+
+    # new style arrays, both fill sides and a new group
+    table = SWFShapeRecordTable()
+    table.append_style_change(0x1f, 0, 0, 1, 2, 1, 2, 1, ["f1", "f2"], ["l1"])
+    table.append_line(4, 1, 100, 0)
+    table.append_curve(4, 50, 50, 0, 50)
+    table.append_style_change(0x06, 0, 0, 2, 0, 0, 2, 1)
+    table.append_line(4, 2, 0, -100)
+    table.append_style_change(0x0e, 0, 0, 0, 0, 0, 2, 1)
+    table.append_style_change(0x1d, 10, 10, 0, 1, 0, 1, 0, ["f3"], [])
+    table.append_line(4, 1, -10, 0)
+    table.append_end()
+    shapes = []
+    for records in (table, list(table)):
+        shape = SWFShape()
+        shape._records = records
+        shapes.append(shape)
+    assert edge_maps(shapes[0]) == edge_maps(shapes[1])
+    assert shapes[0].num_groups == shapes[1].num_groups == 2
+    assert shapes[0]._fillStyles == shapes[1]._fillStyles == ["f1", "f2", "f3"]
+
+def test_shape_record_decoder():
+
+    import random
+    from swf.generator import SWFWriter
+    from swf.stream import SWFBufferStream, SWFStream
+
+    columns = ("types", "num_bits", "flags", "x", "y", "x2", "y2", "style_states",
+               "style_fill0", "style_fill1", "style_line", "style_fill_bits", "style_line_bits")
+
+    def decode(read, data, start, end):
+        stream = SWFBufferStream(data, start, end)
+        fill_bits = stream.readUB(4)
+        line_bits = stream.readUB(4)
+        try:
+            table = read(stream, fill_bits, line_bits, 3)
+        except EOFError:
+            return None
+        return [list(getattr(table, c)) for c in columns], sorted(table.new_styles), stream.tell()
+
+    for seed in range(20):
+        w = SWFWriter()
+        w.writeSHAPERECORDS(random.Random(seed), 20 * seed + 1, num_fill_styles=seed + 1)
+        data = b"\xff" * seed + w.getvalue() + b"\xff" * 8
+        end = len(data) - 8
+        expected = decode(SWFStream.readSHAPERECORDS, data, seed, end)
+        assert expected is not None
+        assert decode(SWFBufferStream.readSHAPERECORDS, data, seed, end) == expected
+        # truncated
+        assert decode(SWFBufferStream.readSHAPERECORDS, data, seed, end - 1) is None
+
+def test_shape_handler():
+
+    from io import BytesIO
+    from swf.data import SWFShapeRecord, SWFShapeRecordHandler
+    from swf.generator import generate
+    from swf.tag import TagDefineFont2, TagDefineShape
+
+    class Counter(SWFShapeRecordHandler):
+        def __init__(self):
+            self.counts = [0] * 5
+            self.bounds = [0, 0, 0, 0]
+            self.x = self.y = 0
+        def on_style_change(self, states, move_dx, move_dy, *args):
+            self.counts[SWFShapeRecord.TYPE_STYLECHANGE] += 1
+            if states & 1:
+                self.x, self.y = move_dx, move_dy
+        def on_line(self, num_bits, flags, dx, dy):
+            self.counts[SWFShapeRecord.TYPE_STRAIGHTEDGE] += 1
+            self.x += dx
+            self.y += dy
+            self.bounds = [min(self.bounds[0], self.x), min(self.bounds[1], self.y),
+                           max(self.bounds[2], self.x), max(self.bounds[3], self.y)]
+        def on_curve(self, num_bits, control_dx, control_dy, anchor_dx, anchor_dy):
+            self.counts[SWFShapeRecord.TYPE_CURVEDEDGE] += 1
+            self.x += control_dx + anchor_dx
+            self.y += control_dy + anchor_dy
+        def on_end(self):
+            self.counts[SWFShapeRecord.TYPE_END] += 1
+
+    data = generate("FWS", shapes=3, edges=200, fonts=1, glyphs=10)
+    expected = [0] * 5
+    swf = SWF(BytesIO(data))
+    shapes = [t.shapes for t in swf.all_tags_of_type(TagDefineShape)]
+    fonts = list(swf.all_tags_of_type(TagDefineFont2))
+    for shape in shapes + [g for f in fonts for g in f.glyphShapeTable]:
+        for record in shape.records:
+            expected[record.type] += 1
+    assert expected[SWFShapeRecord.TYPE_END] == 3 + 10
+
+    counter = Counter()
+    swf = SWF(BytesIO(data), shape_handler=counter)
+    assert counter.counts == expected
+    assert counter.bounds != [0, 0, 0, 0]
+    for tag in swf.all_tags_of_type(TagDefineShape):
+        assert len(tag.shapes.records) == 0
+
+    counter = Counter()
+    for tag, sprite, frame in SWF.iter_tags(BytesIO(data), shape_handler=counter):
+        pass
+    assert counter.counts == expected
+
+def test_slotted_records():
+
+    from swf.data import SWFCurvedEdge, SWFRectangle, SWFShapeRecordStyleChange
+    from swf.tag import TagDefineShape
+
+    swf = SWF(open('./test/data/test.swf', 'rb'))
+    shape = list(swf.all_tags_of_type(TagDefineShape))[0]
+    for record in shape.shapes.records:
+        assert not hasattr(record, '__dict__')
+        assert 'record_id' in repr(record)
+    assert not hasattr(shape.shape_bounds, '__dict__')
+    assert repr(SWFRectangle()) == "<SWFRectangle {'xmin': 0, 'xmax': 0, 'ymin': 0, 'ymax': 0}>"
+    assert "'control': [1, 1]" in repr(SWFCurvedEdge([0, 0], [1, 1], [2, 2], 0, 1))
+    assert SWFShapeRecordStyleChange(None).record_id == -1
+
+def test_bits_lossless_formats():
+
+    import random
+    import zlib
+    from PIL import Image
+    from swf.consts import BitmapFormat
+    from swf.generator import define_bits_lossless
+    from swf.stream import SWFBufferStream
+    from swf.tag import TagDefineBitsLossless, TagDefineBitsLossless2
+
+    def decode(cls, format, alpha, width=5, height=3):
+        body = define_bits_lossless(1, random.Random(format), width, height, format, alpha, 7)
+        tag = cls()
+        tag.parse(SWFBufferStream(body), len(body))
+        header = 8 if format == BitmapFormat.BIT_8 else 7
+        return tag, zlib.decompress(body[header:]), Image.open(tag.bitmapData)
+
+    # colormapped, rows padded to 8 pixels, RGBA color table
+    tag, raw, im = decode(TagDefineBitsLossless2, BitmapFormat.BIT_8, True)
+    assert im.size == (5, 3) and len(tag.image_buffer) == 8 * 3 * 4
+    index = raw[7 * 4 + 8 * 2 + 4]
+    assert im.getpixel((4, 2)) == tuple(bytearray(raw[index * 4:index * 4 + 4]))
+
+    # ARGB and reserved byte + RGB
+    tag, raw, im = decode(TagDefineBitsLossless2, BitmapFormat.BIT_24, True)
+    a, r, g, b = bytearray(raw[(5 * 2 + 4) * 4:(5 * 2 + 5) * 4])
+    assert im.getpixel((4, 2)) == (r, g, b, a)
+    tag, raw, im = decode(TagDefineBitsLossless, BitmapFormat.BIT_24, False)
+    assert im.getpixel((4, 2)) == tuple(bytearray(raw[(5 * 2 + 4) * 4 + 1:(5 * 2 + 5) * 4])) + (255,)
+
+    # big endian PIX15, rows padded to 6 pixels
+    tag, raw, im = decode(TagDefineBitsLossless, BitmapFormat.BIT_15, False)
+    hi, lo = bytearray(raw[(6 * 2 + 4) * 2:(6 * 2 + 5) * 2])
+    pix = hi << 8 | lo
+    assert im.getpixel((4, 2)) == tuple((c & 31) * 255 // 31 for c in (pix >> 10, pix >> 5, pix)) + (255,)
+
+def test_lazy_bitmaps():
+
+    import random
+    import struct
+    import zlib
+    from swf import bitmap
+    from swf.consts import BitmapFormat
+    from swf.generator import define_bits_lossless
+    from swf.stream import SWFBufferStream
+    from swf.tag import TagDefineBitsJPEG3, TagDefineBitsLossless2
+
+    bitmap.cache.clear()
+    body = define_bits_lossless(1, random.Random(0), 30, 20, BitmapFormat.BIT_8)
+    tag = TagDefineBitsLossless2()
+    tag.parse(SWFBufferStream(body), len(body))
+    # nothing is decoded until asked for
+    assert len(bitmap.cache) == 0
+
+    rgba = tag.get_rgba()
+    assert len(rgba) == 30 * 20 * 4 and len(tag.image_buffer) == 32 * 20 * 4
+    assert tag.get_image().tobytes() == rgba
+    png = tag.get_png()
+    assert tag.bitmapData.read() == png
+    hits = bitmap.cache.hits
+    other = TagDefineBitsLossless2()
+    other.parse(SWFBufferStream(body), len(body))
+    assert other.get_png() == png and bitmap.cache.hits == hits + 1
+
+    # least recently used values are dropped first
+    cache = bitmap.BitmapCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.get("a")
+    cache.put("c", b"1")
+    assert "a" in cache and "b" not in cache and cache.nbytes == 6
+    cache.put("d", b"12345678901")
+    assert "d" not in cache
+
+    # the alpha plane of DefineBitsJPEG3 is inflated on first access
+    jpeg = b"\xff\xd8\xff\xd9"
+    body = struct.pack("<HI", 2, len(jpeg)) + jpeg + zlib.compress(b"\x80" * 16)
+    tag = TagDefineBitsJPEG3()
+    tag.parse(SWFBufferStream(body), len(body))
+    assert tag._bitmapAlphaData is None
+    assert tag.bitmapAlphaData.read() == b"\x80" * 16
+
+def test_jpeg_passthrough():
+    import base64
+    from io import BytesIO
+    from PIL import Image
+    from swf.export import SVGExporter
+    from swf.stream import SWFBufferStream
+    from swf.tag import TagDefineBits, TagDefineBitsJPEG2
+    from swf.utils import ImageUtils
+
+    buff = BytesIO()
+    Image.new("RGB", (8, 6), (200, 10, 10)).save(buff, "JPEG")
+    jpeg = buff.getvalue()
+    # split into JPEGTables (up to the frame header) and DefineBits data
+    sof = jpeg.index(b"\xff\xc0")
+    tables, data = jpeg[:sof] + b"\xff\xd9", b"\xff\xd8" + jpeg[sof:]
+    assert ImageUtils.fix_jpeg(data, tables) == jpeg
+    # erroneous header of DefineBitsJPEG2 data
+    assert ImageUtils.fix_jpeg(b"\xff\xd9\xff\xd8" + jpeg) == jpeg
+    assert ImageUtils.fix_jpeg(b"\xff\xd8\xff") is None
+
+    tag = TagDefineBits()
+    body = b"\x01\x00" + data
+    tag.parse(SWFBufferStream(body), len(body))
+    assert tag.get_image_data(tables) == jpeg
+
+    exporter = SVGExporter()
+    exporter.defs = exporter._e.defs()
+    tag = TagDefineBitsJPEG2()
+    body = b"\x02\x00\xff\xd9\xff\xd8" + jpeg
+    tag.parse(SWFBufferStream(body), len(body))
+    exporter.export_define_bits(tag)
+    img = next(exporter.defs.iter("{http://www.w3.org/2000/svg}image"))
+    assert img.get("id") == "c2" and img.get("width") == "8" and img.get("height") == "6"
+    href = img.get("{http://www.w3.org/1999/xlink}href")
+    assert href == "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("ascii")
+
+def test_jpeg3_alpha():
+    import struct
+    import zlib
+    from io import BytesIO
+    from PIL import Image
+    from swf.export import SVGExporter
+    from swf.stream import SWFBufferStream
+    from swf.tag import TagDefineBitsJPEG3
+
+    buff = BytesIO()
+    # premultiplied by alpha 0x80: (100, 50, 0) -> (200, 100, 0)
+    Image.new("RGB", (16, 16), (100, 50, 0)).save(buff, "JPEG", quality=100)
+    jpeg = buff.getvalue()
+    body = struct.pack("<HI", 3, len(jpeg)) + jpeg + zlib.compress(b"\x80" * 256)
+    tag = TagDefineBitsJPEG3()
+    tag.parse(SWFBufferStream(body), len(body))
+    image = tag.get_image()
+    assert image.mode == "RGBA" and image.size == (16, 16)
+    r, g, b, a = image.getpixel((8, 8))
+    assert abs(r - 200) <= 2 and abs(g - 100) <= 2 and b <= 2 and a == 0x80
+
+    exporter = SVGExporter()
+    exporter.defs = exporter._e.defs()
+    exporter.export_define_bits(tag)
+    img = next(exporter.defs.iter("{http://www.w3.org/2000/svg}image"))
+    assert img.get("{http://www.w3.org/1999/xlink}href").startswith("data:image/png;base64,")
+
+    # an alpha plane that doesn't match the image is ignored
+    body = struct.pack("<HI", 3, len(jpeg)) + jpeg + zlib.compress(b"\x80" * 10)
+    tag.parse(SWFBufferStream(body), len(body))
+    assert tag.get_image().mode == "RGB"
+
+def test_decode_bitmaps():
+    from io import BytesIO
+    from swf import bitmap
+    from swf.export import SVGExporter
+    from swf.generator import generate
+    from swf.tag import TagDefineBitsLossless
+
+    data = generate(shapes=0, bitmaps=3, bitmap_size=16)
+    swf = SWF(BytesIO(data))
+    tags = list(swf.all_tags_of_type(TagDefineBitsLossless))
+    assert [tag for tag, jpeg_tables in bitmap.bitmap_tags(swf.tags)] == tags
+
+    # a broken bitmap is left alone
+    tags[2].zlib_bitmap_data = memoryview(b"broken")
+    decoded = bitmap.decode_bitmaps(swf.tags, threads=2,
+                                    select=lambda tag: tag.characterId != 1)
+    assert decoded == [tags[1]]
+    assert tags[1].get_image() is tags[1].get_image()
+    bitmap.release_bitmaps(decoded)
+    assert tags[1].get_image() is not tags[1].get_image()
+
+    decoded = bitmap.decode_bitmaps(swf.tags, png=True)
+    assert decoded == tags[:2] and tags[0].get_png() is tags[0]._png
+    bitmap.release_bitmaps(decoded)
+
+    # the pool is off by default and doesn't change the export
+    class PooledSVGExporter(SVGExporter):
+        bitmap_threads = 2
+    assert SVGExporter.bitmap_threads == 0
+    bitmap.cache.clear()
+    svg = SVGExporter().export(SWF(BytesIO(data))).read()
+    bitmap.cache.clear()
+    assert PooledSVGExporter().export(SWF(BytesIO(data))).read() == svg
+    assert svg.count(b"data:image/png;base64,") == 3
+
+def _swf2svg():
+    """ Import bin/swf2svg.py as the module swf2svg """
+    import sys
+    import types
+    path = './bin/swf2svg.py'
+    module = types.ModuleType("swf2svg")
+    module.__file__ = path
+    # registered, so the batch workers can unpickle convert_path
+    sys.modules["swf2svg"] = module
+    with open(path) as f:
+        exec(compile(f.read(), path, "exec"), module.__dict__)
+    return module
+
+def test_swf2svg_collect_jobs():
+
+    import io
+    import os
+    import shutil
+    import tempfile
+
+    swf2svg = _swf2svg()
+    root = tempfile.mkdtemp()
+    try:
+        a = os.path.join(root, "a")
+        out = os.path.join(root, "out")
+        os.makedirs(os.path.join(a, "b"))
+        for name in ("one.swf", os.path.join("b", "two.SWF"), os.path.join("b", "notes.txt")):
+            open(os.path.join(a, name), 'wb').close()
+        one = os.path.join(a, "one.swf")
+        two = os.path.join(a, "b", "two.SWF")
+
+        assert swf2svg.collect_jobs([a]) == [
+            (one, os.path.join(a, "one.svg")), (two, os.path.join(a, "b", "two.svg"))]
+        assert swf2svg.collect_jobs([a], out_dir=out) == [
+            (one, os.path.join(out, "one.svg")), (two, os.path.join(out, "b", "two.svg"))]
+        assert swf2svg.collect_jobs([os.path.join(a, "*.swf")]) == [(one, os.path.join(a, "one.svg"))]
+
+        manifest = io.StringIO(u"# comment\n\n%s\n%s\t%s\n" % (one, two, os.path.join(out, "x.svg")))
+        assert swf2svg.collect_jobs([], manifest, out) == [
+            (one, os.path.join(out, "one.svg")), (two, os.path.join(out, "x.svg"))]
+
+        svg = os.path.join(a, "one.svg")
+        assert not swf2svg.is_up_to_date(one, svg)
+        open(svg, 'wb').close()
+        os.utime(one, (1000, 1000))
+        os.utime(svg, (2000, 2000))
+        assert swf2svg.is_up_to_date(one, svg)
+        os.utime(svg, (500, 500))
+        assert not swf2svg.is_up_to_date(one, svg)
+    finally:
+        shutil.rmtree(root)
+
+def test_swf2svg_run_batch():
+
+    import json
+    import os
+    import shutil
+    import tempfile
+
+    swf2svg = _swf2svg()
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, "test.swf")
+        shutil.copy('./test/data/test.swf', path)
+        broken = os.path.join(root, "broken.swf")
+        with open(broken, 'wb') as f:
+            f.write(b"not a swf")
+        jobs = swf2svg.collect_jobs([root])
+        options = dict(shape=None, frame=None, names=False)
+
+        results = swf2svg.run_batch(jobs, options, workers=1)
+        assert [(r["swf"], r["status"]) for r in results] == [(broken, "failed"), (path, "ok")]
+        assert "not a SWF file" in results[0]["error"]
+        with open(os.path.join(root, "test.svg"), 'rb') as f:
+            assert f.read().startswith(b"<?xml")
+        # no temp files left behind, and no SVG for the broken file
+        assert sorted(os.listdir(root)) == ["broken.swf", "test.svg", "test.swf"]
+
+        results = swf2svg.run_batch(jobs, options, workers=1)
+        assert [r["status"] for r in results] == ["failed", "skipped"]
+
+        summary_path = os.path.join(root, "summary.json")
+        args = swf2svg.parser.parse_args([root, "--jobs", "1", "--force", "--summary", summary_path])
+        assert swf2svg.main(args) == 1
+        with open(summary_path) as f:
+            summary = json.load(f)
+        assert summary["total"] == 2
+        assert summary["counts"] == {"failed": 1, "ok": 1}
+        assert [r["status"] for r in summary["files"]] == ["failed", "ok"]
+        assert summary["files"][1]["seconds"] > 0
+    finally:
+        shutil.rmtree(root)